@@ -1,49 +1,361 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import copy
+import io
 import os
-from integrated_crop_prediction_training import EnhancedCropCyclePredictionModel
+import threading
+import time
+from integrated_crop_prediction_training import (PHENOLOGY_DATA, EnhancedCropCyclePredictionModel,
+                                                 compare_incremental_to_full, sample_training_csv)
+from model_compaction import compact_model
+from district_feature_store import DistrictFeatureStore, build_feature_store
+from drift_monitor import WINDOW_RECORDS, DriftMonitor
+from forecast_table import ForecastTable, build_forecast_table, sowing_week
+from irrigation_optimizer import crop_base_mm, plan_fields, soil_factor, temperature_factor
+from memory_profile import EndpointMemoryTracker, model_memory, process_rss_bytes, tracemalloc_enabled
+from request_coalescer import DEFAULT_MAX_BATCH, RequestCoalescer
+from response_formats import CSV, JSON, NDJSON, STREAMING_FORMATS, columnar_response, negotiate, not_acceptable
+from training_cache import TrainingCache
+from upload_scoring import CHUNK_ROWS, read_chunks, stream_scores
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import math
+import numpy as np
 
 app = Flask(__name__)
 CORS(app)
 
+# Optional per-endpoint peak allocation tracking (AGRI_TRACEMALLOC=1; slows requests)
+memory_tracker = EndpointMemoryTracker(app) if tracemalloc_enabled() else None
+
 MODEL_PATH = os.environ.get('AGRI_MODEL_PATH', 'agri_forecasting_model.pkl')
 DATASET_PATH = os.environ.get('AGRI_DATASET_PATH', 'D:/Hackathons/Vortexa/HarvestIQ/ml_services/large_agri_dataset.csv')
+MODEL_BACKEND = os.environ.get('AGRI_MODEL_BACKEND', 'random_forest')
+INTERVAL_MODE = os.environ.get('AGRI_INTERVAL_MODE', 'quantile_forest')
+# Full retrains stream a uniform sample of at most this many CSV rows (unset: read the whole CSV)
+TRAIN_MAX_ROWS = int(os.environ['AGRI_TRAIN_MAX_ROWS']) if os.environ.get('AGRI_TRAIN_MAX_ROWS') else None
+
+# Fitted estimators and whole models keyed by dataset/settings hash (AGRI_TRAINING_CACHE_DIR)
+training_cache = TrainingCache()
+
+WARMUP_RECORD = {'avg_temp': 27.0, 'tmax': 36.0, 'tmin': 21.0}  # roughly the training-data means
+
+# The model and the data resources (climatology, district features, soil index) are
+# loaded in background threads so the server binds immediately. `model` stays None
+# (model endpoints answer 503) until it is loaded and warmed up; routes that need a
+# resource answer 503 until that resource is loaded.
+model = None
+startup = {
+    "state": "starting",
+    "source": None,
+    "load_s": None,
+    "warmup_s": None,
+    "warmup_ms_per_crop": {},
+    "total_s": None,
+    "error": None,
+    "resources": {"climatology": "starting", "district_features": "starting", "soil_index": "starting"},
+}
+startup_done = threading.Event()
+resources_done = threading.Event()
+STARTED_AT = time.perf_counter()
+LOADING_STATES = ("starting", "loading", "warming_up")
+
+def _train_or_reuse(df, backend=MODEL_BACKEND, interval_mode=INTERVAL_MODE, force=False):
+    """Model trained on `df`, reused from the training cache when the dataset and settings
+    are unchanged; returns (model, source)"""
+    candidate = EnhancedCropCyclePredictionModel(backend=backend, interval_mode=interval_mode)
+    key = candidate.training_key_for(df)
+    if not force and training_cache.has_model(key):
+        cached = EnhancedCropCyclePredictionModel.load_model(training_cache.model_path(key))
+        if cached is not None:
+            return cached, "cache"
+    candidate.train_models(df, cache=None if force else training_cache)
+    candidate.save_model(training_cache.model_path(key, create=True))
+    return candidate, "trained"
+
+def _read_training_csv(path, max_rows=None):
+    """Training frame from a CSV: all rows, or a streamed uniform sample of at most `max_rows`"""
+    if max_rows:
+        return sample_training_csv(path, max_rows)
+    import pandas as pd
+    return pd.read_csv(path)
+
+def _load_or_train_model():
+    """Load the trained model (with fallback to train if missing); returns (model, source)"""
+    loaded = EnhancedCropCyclePredictionModel.load_model(MODEL_PATH)
+    if loaded is not None:
+        return loaded, "pickle"
+    if os.path.exists(DATASET_PATH):
+        try:
+            df = _read_training_csv(DATASET_PATH, TRAIN_MAX_ROWS)
+            trained, source = _train_or_reuse(df)
+            trained.save_model(MODEL_PATH)
+            return trained, source
+        except Exception as e:
+            print(f"Failed to train model on startup: {e}")
+    return None, None
+
+def _warm_up(candidate):
+    """One inference per crop so the first real request doesn't pay one-off setup costs"""
+    timings = {}
+    for crop in candidate.phenology_data:
+        start = time.perf_counter()
+        candidate.predict_batch([{'crop_type': crop, **WARMUP_RECORD}])
+        timings[crop] = round((time.perf_counter() - start) * 1000, 2)
+    try:
+        # Builds the explainer's per-node tables up front
+        candidate.predict_batch([{'crop_type': next(iter(candidate.phenology_data)), **WARMUP_RECORD}], explain=True)
+    except ValueError:
+        pass  # backend without per-prediction explanations
+    return timings
+
+def _startup():
+    global model
+    try:
+        startup["state"] = "loading"
+        start = time.perf_counter()
+        loaded, startup["source"] = _load_or_train_model()
+        startup["load_s"] = round(time.perf_counter() - start, 3)
+        if loaded is None:
+            startup.update(state="failed", error=f"No model at {MODEL_PATH} and no dataset to train from")
+            return
+
+        startup["state"] = "warming_up"
+        start = time.perf_counter()
+        startup["warmup_ms_per_crop"] = _warm_up(loaded)
+        startup["warmup_s"] = round(time.perf_counter() - start, 3)
+        model = loaded
+        reset_drift_monitor()
+
+        # Precomputed forecasts for /forecast: reuse the table on disk, or build it once
+        # (building needs the climatology from the resource thread)
+        resources_done.wait()
+        refresh_forecast_table(rebuild=not os.path.exists(FORECAST_TABLE_PATH))
+        startup["state"] = "ready"
+    except Exception as e:
+        print(f"Failed to load model on startup: {e}")
+        startup.update(state="failed", error=str(e))
+    finally:
+        startup["total_s"] = round(time.perf_counter() - STARTED_AT, 3)
+        startup_done.set()
+
+def model_unavailable():
+    """503 for model endpoints: still starting up, or no model at all"""
+    if startup["state"] in LOADING_STATES:
+        return jsonify({"error": "Model is loading", "startup": startup["state"]}), 503
+    return jsonify({"error": "Model not loaded"}), 503
+
+RESOURCE_LABELS = {"climatology": "Weather climatology", "district_features": "District feature store",
+                   "soil_index": "District index"}
+
+def resource_unavailable(name, message):
+    """503 for routes that need a data resource: still loading, or not available"""
+    state = startup["resources"][name]
+    if state in LOADING_STATES:
+        return jsonify({"error": f"{RESOURCE_LABELS[name]} is loading", "startup": state}), 503
+    return jsonify({"error": message}), 503
+
+# Optional micro-batching of concurrent /predict calls (0 disables it)
+COALESCE_WINDOW_MS = float(os.environ.get('AGRI_COALESCE_WINDOW_MS', '0'))
+COALESCE_MAX_BATCH = int(os.environ.get('AGRI_COALESCE_MAX_BATCH', DEFAULT_MAX_BATCH))
+COALESCE_TIMEOUT_MS = float(os.environ.get('AGRI_COALESCE_TIMEOUT_MS', '0'))  # 0 = derived from window and batch size
+coalescer = None
+if COALESCE_WINDOW_MS > 0:
+    # Looks `model` up per batch so a retrained model is picked up without a restart
+    coalescer = RequestCoalescer(lambda records, explain: model.predict_batch(records, explain=explain),
+                                 COALESCE_WINDOW_MS, COALESCE_MAX_BATCH, COALESCE_TIMEOUT_MS or None)
+
+# Live input drift against the training distribution stored in the model artifact
+DRIFT_WINDOW = int(os.environ.get('AGRI_DRIFT_WINDOW', WINDOW_RECORDS))
+drift_monitor = None
+
+def reset_drift_monitor():
+    """Start counting live inputs against the current model's training reference"""
+    global drift_monitor
+    reference = getattr(model, 'input_reference', None)
+    drift_monitor = DriftMonitor(reference, DRIFT_WINDOW) if reference else None
+
+WEATHER_PATH = os.environ.get('AGRI_WEATHER_PATH', 'Processed_AgriWeather.csv')
+MAX_SWEEP_SCENARIOS = 20000
+MAX_IRRIGATION_FIELDS = 10000
+
+# Sowing-date temperature climatology for /predict/sweep (optional: needs the weather history)
+climatology = None
+
+def _load_climatology():
+    if not os.path.exists(WEATHER_PATH):
+        return None
+    from climatology import SowingClimatology
+    return SowingClimatology.from_csv(WEATHER_PATH)
+
+FORECAST_TABLE_PATH = os.environ.get('AGRI_FORECAST_TABLE_PATH', 'forecast_table.npy')
+FORECAST_INDEX_PATH = os.path.splitext(FORECAST_TABLE_PATH)[0] + '.json'
+DISTRICT_CLIMATE_PATH = os.environ.get('AGRI_DISTRICT_CLIMATE_PATH', 'agri_forecasting_dataset.csv')
+
+def refresh_forecast_table(rebuild=True):
+    """Re-score the (district, crop, sowing week) table with the current model and reload it"""
+    global forecast_table
+    try:
+        if rebuild and model is not None and climatology is not None and os.path.exists(DISTRICT_CLIMATE_PATH):
+            build_forecast_table(model, climatology, DISTRICT_CLIMATE_PATH, FORECAST_TABLE_PATH, FORECAST_INDEX_PATH)
+            rebuilt = True
+        else:
+            rebuilt = False
+        if os.path.exists(FORECAST_TABLE_PATH) and os.path.exists(FORECAST_INDEX_PATH):
+            forecast_table = ForecastTable.load(FORECAST_TABLE_PATH, FORECAST_INDEX_PATH)
+        return rebuilt
+    except Exception as e:
+        print(f"Failed to refresh forecast table: {e}")
+        return False
 
-# Load the trained model at server start (with fallback to train if missing)
-model = EnhancedCropCyclePredictionModel.load_model(MODEL_PATH)
-if model is None and os.path.exists(DATASET_PATH):
+forecast_table = None
+
+DISTRICTS_PATH = os.environ.get('AGRI_DISTRICTS_PATH', 'gadm41_IND_shp.zip')
+DISTRICT_SOIL_PATH = os.environ.get('AGRI_DISTRICT_SOIL_PATH', 'soilgrids_district_zonal.csv')
+
+# Spatial index for /soil (optional: needs the GADM file and the geo stack)
+soil_index = None
+
+def _load_soil_index():
+    if not os.path.exists(DISTRICTS_PATH):
+        return None
+    from district_soil_index import DistrictSoilIndex
+    return DistrictSoilIndex.from_files(DISTRICTS_PATH, soil_csv=DISTRICT_SOIL_PATH)
+
+# Per-district climate normals and soil for /predict by district (built from the weather history when missing)
+DISTRICT_FEATURES_PATH = os.environ.get('AGRI_DISTRICT_FEATURES_PATH', 'district_features')
+TEMPERATURE_FIELDS = ('avg_temp', 'tmax', 'tmin')
+district_features = None
+
+def _load_district_features():
+    index_path = os.path.join(DISTRICT_FEATURES_PATH, 'index.json')
+    if not os.path.exists(index_path) and climatology is not None and os.path.exists(DISTRICT_CLIMATE_PATH):
+        build_feature_store(climatology, DISTRICT_SOIL_PATH, DISTRICT_CLIMATE_PATH, DISTRICT_FEATURES_PATH)
+    return DistrictFeatureStore.load(DISTRICT_FEATURES_PATH) if os.path.exists(index_path) else None
+
+def _load_resource(name, loader):
+    """(value, state) of one optional resource; 'unavailable' when its input files are missing"""
+    startup["resources"][name] = "loading"
     try:
-        import pandas as pd
-        df = pd.read_csv(DATASET_PATH)
-        model = EnhancedCropCyclePredictionModel()
-        model.train_models(df)
-        model.save_model(MODEL_PATH)
+        value = loader()
     except Exception as e:
-        print(f"Failed to train model on startup: {e}")
-        model = None
+        print(f"Failed to load {RESOURCE_LABELS[name].lower()} on startup: {e}")
+        return None, "failed"
+    return value, "ready" if value is not None else "unavailable"
+
+def _startup_resources():
+    global climatology, district_features, soil_index
+    try:
+        # Publish each value before its state, so a 'ready' resource is never None
+        climatology, state = _load_resource("climatology", _load_climatology)
+        startup["resources"]["climatology"] = state
+        district_features, state = _load_resource("district_features", _load_district_features)
+        startup["resources"]["district_features"] = state
+        soil_index, state = _load_resource("soil_index", _load_soil_index)
+        startup["resources"]["soil_index"] = state
+    finally:
+        resources_done.set()
+
+def _fill_district_features(records):
+    """Fill in the temperatures of records that name a district instead (explicit values win).
+
+    Also accepts 'crop' for 'crop_type'. Returns the district features used for
+    each record (None where nothing was filled).
+    """
+    for record in records:
+        if 'crop_type' not in record and 'crop' in record:
+            record['crop_type'] = record['crop']
+    wanted = [i for i, r in enumerate(records)
+              if r.get('district') is not None and not all(f in r for f in TEMPERATURE_FIELDS)]
+    filled = [None] * len(records)
+    if not wanted:
+        return filled
+    if district_features is None:
+        raise LookupError("District feature store not loaded; pass avg_temp, tmax and tmin")
+    features = district_features.lookup_many([records[i]['district'] for i in wanted],
+                                             [records[i].get('sowing_date') for i in wanted])
+    for i, feature in zip(wanted, features):
+        for name in TEMPERATURE_FIELDS:
+            records[i].setdefault(name, feature[name])
+        filled[i] = feature
+    return filled
+
+threading.Thread(target=_startup_resources, name='resource-startup', daemon=True).start()
+threading.Thread(target=_startup, name='model-startup', daemon=True).start()
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok", "model_loaded": model is not None})
+    status = {"status": "ok", "model_loaded": model is not None, "startup": startup["state"]}
+    if coalescer is not None:
+        status["coalescer"] = coalescer.stats()
+    return jsonify(status)
+
+@app.route("/health/live", methods=["GET"])
+def health_live():
+    return jsonify({"status": "alive", "uptime_s": round(time.perf_counter() - STARTED_AT, 3)})
+
+@app.route("/health/ready", methods=["GET"])
+def health_ready():
+    ready = model is not None and resources_done.is_set()
+    return jsonify({"ready": ready, "startup": startup}), 200 if ready else 503
+
+@app.route("/admin/memory", methods=["GET"])
+def admin_memory():
+    report = {
+        "rss_bytes": process_rss_bytes(),
+        "model": model_memory(model) if model is not None else None,
+        "forecast_table_bytes": forecast_table.table.nbytes if forecast_table is not None else None,
+        "tracemalloc": memory_tracker.stats() if memory_tracker is not None else None,
+    }
+    report["rss_mb"] = round(report["rss_bytes"] / 1024 / 1024, 1) if report["rss_bytes"] is not None else None
+    return jsonify(report)
+
+@app.route("/drift", methods=["GET"])
+def drift():
+    if model is None:
+        return model_unavailable()
+    if drift_monitor is None:
+        return jsonify({"error": "This model has no training input reference; retrain it to enable drift monitoring"}), 503
+    return jsonify(drift_monitor.report())
 
 @app.route("/predict", methods=["POST"])
 def predict():
     try:
         if model is None:
-            return jsonify({"error": "Model not loaded"}), 503
+            return model_unavailable()
+
+        response_format = negotiate(request.accept_mimetypes)
+        if response_format is None:
+            return jsonify(not_acceptable()), 406
 
         data = request.get_json(force=True)
         # print("/predict request:", data)
+        try:
+            district_info = _fill_district_features([data])[0]
+        except LookupError as le:
+            return resource_unavailable("district_features", str(le))
         crop = data['crop_type']
         avg_temp = float(data['avg_temp'])
         tmax = float(data['tmax'])
         tmin = float(data['tmin'])
         sowing_date = data.get('sowing_date')  # Optional
+        explain = bool(data.get('explain', False))
+
+        record = {'crop_type': crop, 'avg_temp': avg_temp, 'tmax': tmax, 'tmin': tmin, 'sowing_date': sowing_date}
+        if drift_monitor is not None:
+            drift_monitor.record(crop, avg_temp, tmax, tmin)
+        if response_format != JSON:
+            return columnar_response(model.predict_columns([record], explain=explain), response_format)
 
-        prediction = model.predict_with_current_date(crop, avg_temp, tmax, tmin, sowing_date)
+        if coalescer is not None:
+            try:
+                prediction = coalescer.submit(record, explain)
+            except TimeoutError as te:
+                return jsonify({"error": str(te)}), 503
+        else:
+            prediction = model.predict_with_current_date(crop, avg_temp, tmax, tmin, sowing_date, explain=explain)
+        if district_info is not None:
+            prediction['district_features'] = district_info
         # print("/predict response:", prediction)
         return jsonify(prediction)
     except KeyError as ke:
@@ -51,26 +363,263 @@ def predict():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    try:
+        if model is None:
+            return model_unavailable()
+
+        response_format = negotiate(request.accept_mimetypes)
+        if response_format is None:
+            return jsonify(not_acceptable()), 406
+
+        data = request.get_json(force=True) or {}
+        records = data.get('records')
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "'records' must be a non-empty list"}), 400
+        try:
+            district_info = _fill_district_features(records)
+        except LookupError as le:
+            return resource_unavailable("district_features", str(le))
+        for i, record in enumerate(records):
+            missing = [f for f in ('crop_type', 'avg_temp', 'tmax', 'tmin') if f not in record]
+            if missing:
+                return jsonify({"error": f"Record {i}: missing field(s) {', '.join(missing)}"}), 400
+
+        if drift_monitor is not None:
+            drift_monitor.record_many([r['crop_type'] for r in records],
+                                      [[r['avg_temp'], r['tmax'], r['tmin']] for r in records])
+
+        explain = bool(data.get('explain', False))
+        if response_format != JSON:
+            return columnar_response(model.predict_columns(records, explain=explain), response_format)
+
+        predictions = model.predict_batch(records, explain=explain)
+        for prediction, info in zip(predictions, district_info):
+            if info is not None:
+                prediction['district_features'] = info
+        return jsonify({"predictions": predictions})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/predict/sweep", methods=["POST"])
+def predict_sweep():
+    try:
+        if model is None:
+            return model_unavailable()
+
+        data = request.get_json(force=True) or {}
+        crop_types = data.get('crop_types') or ([data['crop_type']] if 'crop_type' in data else None)
+        if not crop_types:
+            return jsonify({"error": "Missing field: 'crop_type' (or 'crop_types')"}), 400
+
+        start_date = np.datetime64(data['start_date'], 'D')
+        end_date = np.datetime64(data['end_date'], 'D')
+        step_days = int(data.get('step_days', 7))
+        if step_days < 1 or end_date < start_date:
+            return jsonify({"error": "'end_date' must not be before 'start_date' and 'step_days' must be >= 1"}), 400
+        sowing_dates = np.arange(start_date, end_date + 1, step_days)
+        temp_offsets = [float(t) for t in data.get('temp_offsets', [0])] or [0.0]
+
+        scenarios = len(crop_types) * len(sowing_dates) * len(temp_offsets)
+        if scenarios > MAX_SWEEP_SCENARIOS:
+            return jsonify({"error": f"Sweep has {scenarios} scenarios; the limit is {MAX_SWEEP_SCENARIOS}"}), 400
+
+        # Fixed temperatures from the request, else the climatology of each sowing date
+        if all(key in data for key in ('avg_temp', 'tmax', 'tmin')):
+            base = [float(data['avg_temp']), float(data['tmax']), float(data['tmin'])]
+            base_temperatures, source = np.tile(base, (len(sowing_dates), 1)), 'request'
+        elif climatology is not None:
+            base_temperatures, source = climatology.temperatures(sowing_dates), 'climatology'
+        else:
+            return resource_unavailable("climatology", "Weather climatology not loaded; pass avg_temp, tmax and tmin")
+
+        result = model.predict_sweep(crop_types, sowing_dates, base_temperatures, temp_offsets,
+                                     window_days=int(data.get('window_days', 14)))
+        result['temperature_source'] = source
+        return jsonify(result)
+    except KeyError as ke:
+        return jsonify({"error": f"Missing field: {str(ke)}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/predict/upload", methods=["POST"])
+def predict_upload():
+    """Score a CSV upload (multipart 'file' or raw text/csv body), streaming NDJSON or CSV back"""
+    try:
+        if model is None:
+            return model_unavailable()
+
+        mimetype = request.args.get('format')
+        mimetype = {'csv': CSV, 'ndjson': NDJSON}.get(mimetype, mimetype)
+        if mimetype is None:
+            mimetype = request.accept_mimetypes.best_match(STREAMING_FORMATS) or NDJSON
+        if mimetype not in STREAMING_FORMATS:
+            return jsonify({"error": "format must be 'ndjson' or 'csv'", "supported": list(STREAMING_FORMATS)}), 406
+
+        upload = request.files.get('file')
+        if upload is not None:
+            # Uploaded files are closed when the view returns, before the response is streamed:
+            # keep our own handle to the spooled file and close it once the response is done
+            stream, upload.stream = upload.stream, io.BytesIO()
+        else:
+            stream = request.stream
+        chunk_rows = max(1, int(request.args.get('chunk_rows', CHUNK_ROWS)))
+        id_columns = request.args.get('id_columns')
+        id_columns = [c.strip().lower() for c in id_columns.split(',') if c.strip()] if id_columns else None
+        explain = request.args.get('explain', '').lower() in ('1', 'true', 'yes')
+
+        # Header problems are reported as a normal 400 before streaming starts
+        chunks = read_chunks(stream, chunk_rows)
+        scores = stream_scores(model, chunks, mimetype, id_columns, explain, drift_monitor)
+        response = Response(stream_with_context(scores), mimetype=mimetype)
+        if upload is not None:
+            response.call_on_close(stream.close)
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/forecast", methods=["GET"])
+def forecast():
+    try:
+        if forecast_table is None:
+            if startup["state"] in LOADING_STATES:
+                return jsonify({"error": "Forecast table is loading", "startup": startup["state"]}), 503
+            return jsonify({"error": "Forecast table not loaded"}), 503
+
+        district = request.args.get('district')
+        crop = request.args.get('crop_type', request.args.get('crop'))
+        if not district or not crop:
+            return jsonify({"error": "Missing field: 'district' and 'crop_type' are required"}), 400
+        if 'week' in request.args:
+            week = int(request.args['week'])
+            if not 0 <= week < forecast_table.index['weeks']:
+                return jsonify({"error": f"'week' must be between 0 and {forecast_table.index['weeks'] - 1}"}), 400
+        else:
+            week = sowing_week(request.args.get('sowing_date') or datetime.now())
+
+        result = forecast_table.lookup(district, crop, week)
+        if result is None:
+            return jsonify({
+                "error": "Unknown district or crop",
+                "districts": forecast_table.index['districts'],
+                "crops": forecast_table.index['crops'],
+            }), 404
+        result['table_created'] = forecast_table.index['created']
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/soil", methods=["GET", "POST"])
+def soil():
+    try:
+        if soil_index is None:
+            return resource_unavailable("soil_index", "District index not loaded")
+
+        data = request.args if request.method == "GET" else (request.get_json(force=True) or {})
+        lat = data.get('lat')
+        lon = data.get('lng', data.get('lon'))
+        if lat is None or lon is None:
+            return jsonify({"error": "Missing field: 'lat' and 'lon' (or 'lng') are required"}), 400
+        lat, lon = float(lat), float(lon)
+
+        result = soil_index.lookup(lon, lat)
+        if result['district'] is None:
+            return jsonify({"error": "No district found at this location", "lat": lat, "lon": lon}), 404
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 # Optional: endpoint to retrain and refresh the model
+# One /train at a time: each builds on the model the previous one swapped in
+train_lock = threading.Lock()
+
 @app.route("/train", methods=["POST"])
 def train():
+    with train_lock:
+        return _train()
+
+def _train():
     try:
+        if startup["state"] in LOADING_STATES:
+            return model_unavailable()
+
+        global model
         payload = request.get_json(silent=True) or {}
         print("/train request:", payload)
         dataset_path = payload.get('dataset_path', DATASET_PATH)
-        import pandas as pd
-        df = pd.read_csv(dataset_path)
-        new_model = EnhancedCropCyclePredictionModel()
-        new_model.train_models(df)
+        incremental = payload.get('mode') == 'incremental'
+        if incremental and payload.get('max_rows'):
+            return jsonify({"error": "max_rows applies to full retrains; incremental mode reads every appended row"}), 400
+        if incremental and getattr(model, 'training_sampled', False):
+            return jsonify({"error": "The model was trained on a sample of the CSV; run a full retrain"}), 400
+        # Incremental updates need the CSV in file order; full retrains may stream a capped sample
+        df = _read_training_csv(dataset_path, None if incremental else payload.get('max_rows', TRAIN_MAX_ROWS))
+
+        # Incremental mode: fit extra trees on rows appended since the last training
+        if incremental:
+            if model is None or not model.training_rows:
+                return jsonify({"error": "Incremental training needs a loaded model with a recorded dataset size"}), 400
+            previous_rows = model.training_rows
+            if len(df) <= previous_rows:
+                return jsonify({"status": "up_to_date", "total_rows": len(df)})
+
+            update_kwargs = {
+                key: payload[key]
+                for key in ('new_tree_fraction', 'max_yield_trees', 'max_cycle_trees')
+                if key in payload
+            }
+            # Update a copy: /predict keeps scoring the served model until the swap
+            updated = copy.deepcopy(model)
+            if payload.get('compare_full'):
+                report = compare_incremental_to_full(updated, df, previous_rows, **update_kwargs)
+            else:
+                report = updated.update_models(df.iloc[previous_rows:], **update_kwargs)
+            updated.save_model(MODEL_PATH)
+            model = updated
+            reset_drift_monitor()
+            report['forecast_table_refreshed'] = refresh_forecast_table()
+            return jsonify({"status": "updated", "report": report, "metrics": model.metrics})
+
+        backend = payload.get('backend', MODEL_BACKEND)
+        interval_mode = payload.get('interval_mode', INTERVAL_MODE)
+        force = bool(payload.get('force'))
+        compact = payload.get('compact')
+
+        # Same data and settings as the serving model: nothing to retrain
+        if not force and not compact and model is not None and not model.compaction:
+            key = EnhancedCropCyclePredictionModel(backend=backend, interval_mode=interval_mode).training_key_for(df)
+            if model.training_key == key:
+                return jsonify({"status": "unchanged", "training_key": key, "metrics": model.metrics})
+
+        # Training steps whose inputs are unchanged are reused from the cache unless forced
+        new_model, source = _train_or_reuse(df, backend, interval_mode, force)
+
+        # Optional post-training compaction, e.g. {"compact": {"target_size_mb": 5}}
+        if compact:
+            new_model = compact_model(new_model, **{
+                key: compact[key]
+                for key in ('max_depth', 'max_trees', 'tolerance', 'target_size_mb')
+                if key in compact
+            })
+
         new_model.save_model(MODEL_PATH)
-        global model
         model = new_model
+        reset_drift_monitor()
+        forecast_table_refreshed = refresh_forecast_table()
         # print("/train response: trained with metrics:", new_model.metrics)
-        return jsonify({"status": "trained", "metrics": new_model.metrics})
+        return jsonify({"status": "trained", "source": source, "metrics": new_model.metrics,
+                        "training_rows": new_model.training_rows,
+                        "training_key": new_model.training_key, "cache": training_cache.stats(),
+                        "forecast_table_refreshed": forecast_table_refreshed})
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
+def _phenology():
+    """Crop growth stages of the serving model (the built-in table while it loads)"""
+    return model.phenology_data if model is not None else PHENOLOGY_DATA
+
 def _rule_based_irrigation_schedule(
     crop: str,
     sowing_date: str,
@@ -108,17 +657,7 @@ def _rule_based_irrigation_schedule(
             stages = growth_stages
 
     # Soil adjustments
-    soil_type = (soil or {}).get("type", "").lower()
-    drainage = (soil or {}).get("drainage", "").lower()
-    soil_factor = 1.0
-    if "clay" in soil_type:
-        soil_factor -= 0.1  # holds water longer
-    if "sandy" in soil_type:
-        soil_factor += 0.15 # drains fast
-    if drainage == "poor":
-        soil_factor -= 0.1
-    elif drainage == "good":
-        soil_factor += 0.05
+    soil_adjustment = soil_factor(soil)
 
     # Heuristic schedule across 8 weeks from sowing
     schedule: List[Dict[str, Any]] = []
@@ -137,27 +676,13 @@ def _rule_based_irrigation_schedule(
                 rain_est_mm = 2.0 * avg_week_rain
 
         # Base irrigation mm for two-week window depending on crop
-        crop_lc = (crop or "").lower()
-        if "rice" in crop_lc:
-            base_mm = 120
-        elif "wheat" in crop_lc:
-            base_mm = 80
-        elif "maize" in crop_lc or "corn" in crop_lc:
-            base_mm = 100
-        elif "sugarcane" in crop_lc:
-            base_mm = 180
-        else:
-            base_mm = 90
+        base_mm = crop_base_mm(crop)
 
         # Temperature adjustment
-        if avg_temp is not None:
-            if avg_temp >= 34:
-                base_mm *= 1.2
-            elif avg_temp <= 22:
-                base_mm *= 0.9
+        base_mm *= temperature_factor(avg_temp)
 
         # Soil factor
-        base_mm *= soil_factor
+        base_mm *= soil_adjustment
 
         # Rain offset: subtract 60% of expected rain from requirement
         req_mm = max(0, base_mm - 0.6 * rain_est_mm)
@@ -198,6 +723,16 @@ def _rule_based_irrigation_schedule(
 def irrigation():
     try:
         data = request.get_json(force=True) or {}
+
+        # Many fields at once: budget-constrained stage plans only
+        if "fields" in data:
+            fields = data["fields"]
+            if not isinstance(fields, list) or not fields:
+                return jsonify({"error": "fields must be a non-empty list"}), 400
+            if len(fields) > MAX_IRRIGATION_FIELDS:
+                return jsonify({"error": f"At most {MAX_IRRIGATION_FIELDS} fields per request"}), 400
+            return jsonify({"fields": plan_fields(fields, data.get("water_budget_mm"), phenology=_phenology())})
+
         crop = data.get("crop_type") or data.get("crop")
         sowing_date = data.get("sowing_date") or datetime.utcnow().strftime("%Y-%m-%d")
         weekly_forecast = data.get("weekly_forecast") or []
@@ -207,12 +742,17 @@ def irrigation():
         # For robustness in hackathon setting, use rule-based by default.
         result = _rule_based_irrigation_schedule(crop, sowing_date, weekly_forecast, crop_cycle, soil)
 
-        return jsonify({
+        response = {
             "crop_type": crop,
             "sowing_date": sowing_date,
             "irrigation_schedule": result["irrigation_schedule"],
             "water_savings": result["water_savings"],
-        })
+        }
+        # With a seasonal budget, also allocate it across the growth stages
+        if data.get("water_budget_mm") is not None:
+            response["budget_plan"] = plan_fields([{**data, "crop_type": crop, "sowing_date": sowing_date}],
+                                                  phenology=_phenology())[0]
+        return jsonify(response)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
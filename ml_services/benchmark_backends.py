@@ -0,0 +1,61 @@
+# Benchmark of the model backends: training time, artifact size, latency, accuracy
+# Usage: python benchmark_backends.py [dataset.csv] [n_latency_requests]
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from integrated_crop_prediction_training import EnhancedCropCyclePredictionModel
+from model_backends import BACKENDS
+
+DATASET = sys.argv[1] if len(sys.argv) > 1 else 'large_agri_dataset.csv'
+N_REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+
+def benchmark_backend(backend, df, requests):
+    model = EnhancedCropCyclePredictionModel(backend=backend)
+    start = time.perf_counter()
+    model.train_models(df)
+    train_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.pkl')
+        model.save_model(path)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        start = time.perf_counter()
+        EnhancedCropCyclePredictionModel.load_model(path)
+        load_s = time.perf_counter() - start
+
+    latencies = []
+    for row in requests.itertuples():
+        start = time.perf_counter()
+        model.predict_with_current_date(row.Crop_Type, row.Avg_Temp, row.Tmax, row.Tmin, row.Sowing_Date)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'backend': backend,
+        'train_s': round(train_s, 2),
+        'artifact_mb': round(size_mb, 2),
+        'load_s': round(load_s, 3),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'yield_r2': round(model.metrics['yield']['r2'], 3),
+        'yield_rmse': round(model.metrics['yield']['rmse'], 3),
+        'mean_phenology_r2': round(float(np.mean([m['r2'] for k, m in model.metrics.items() if k != 'yield'])), 3),
+    }
+
+
+if __name__ == "__main__":
+    df = pd.read_csv(DATASET)
+    requests = df.sample(n=min(N_REQUESTS, len(df)), random_state=0)
+
+    results = [benchmark_backend(name, df, requests) for name in BACKENDS]
+
+    print("\n" + "="*60)
+    print(f"📊 BACKEND BENCHMARK ({len(df)} rows, {len(requests)} single-record requests)")
+    print("="*60)
+    print(pd.DataFrame(results).set_index('backend').T.to_string())
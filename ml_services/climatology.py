@@ -0,0 +1,54 @@
+# Sowing-date climatology from the daily weather history
+# The model's Avg_Temp/Tmax/Tmin behave like means over the month after sowing,
+# so for every day of the year we average that forward window across all years.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# ====== CONFIG ======
+WEATHER_CSV = 'Processed_AgriWeather.csv'
+WINDOW_DAYS = 30      # days after sowing the temperature features summarise
+MISSING_VALUE = -999  # NASA POWER fill value
+
+TEMPERATURE_COLUMNS = {'Avg_Temp': 'Temp_Mean_C', 'Tmax': 'Temp_Max_C', 'Tmin': 'Temp_Min_C'}
+
+
+def load_weather(path=WEATHER_CSV):
+    """Daily weather indexed by date, with fill values as NaN (from a CSV or a weather_store directory)"""
+    if os.path.isdir(path):
+        from weather_store import WeatherStore
+        return WeatherStore(path).frame()
+    weather = pd.read_csv(path, parse_dates=['DATE']).set_index('DATE').sort_index()
+    return weather.replace(MISSING_VALUE, np.nan)
+
+
+def sowing_climatology(weather, window_days=WINDOW_DAYS):
+    """(366 x 3) frame of Avg_Temp/Tmax/Tmin climatology, indexed by day of year"""
+    temps = weather[list(TEMPERATURE_COLUMNS.values())].asfreq('D')
+    # Forward window: the value at day d summarises d .. d + window_days - 1
+    forward = temps[::-1].rolling(window_days, min_periods=window_days // 2).mean()[::-1]
+    by_day = forward.groupby(forward.index.dayofyear).mean().reindex(range(1, 367))
+
+    # Fill days without data by wrapping around the year end
+    wrapped = pd.concat([by_day, by_day, by_day], ignore_index=True).interpolate(limit_direction='both')
+    by_day = wrapped.iloc[366:732].set_axis(by_day.index)
+    return by_day.rename(columns={v: k for k, v in TEMPERATURE_COLUMNS.items()})
+
+
+class SowingClimatology:
+    """Day-of-year lookup of the model's temperature features"""
+
+    def __init__(self, table):
+        self.table = table
+        self._values = table[list(TEMPERATURE_COLUMNS)].to_numpy()
+
+    @classmethod
+    def from_csv(cls, path=WEATHER_CSV, window_days=WINDOW_DAYS):
+        return cls(sowing_climatology(load_weather(path), window_days))
+
+    def temperatures(self, dates):
+        """(n_dates x 3) Avg_Temp, Tmax, Tmin for an array of datetime64[D] sowing dates"""
+        doy = pd.DatetimeIndex(np.asarray(dates, dtype='datetime64[D]')).dayofyear.to_numpy()
+        return self._values[doy - 1]
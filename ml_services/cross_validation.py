@@ -0,0 +1,202 @@
+# Cross-validated evaluation of the yield and phenology models
+# Every (target, fold) fit runs as one task in a process pool. The feature matrix,
+# targets and fold indices are written once to .npy files that the workers
+# memory-map, so all targets share the same folds and nothing large is pickled
+# per task. Folds are shuffled k-fold, or time-ordered by Sowing_Date (expanding
+# window: train on everything sown before the test block).
+# Usage: python cross_validation.py large_agri_dataset.csv --folds 5 --mode time
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold
+
+from integrated_crop_prediction_training import (PHENOLOGY_TARGETS, SPLIT_SEED, TRAINING_COLUMNS,
+                                                 EnhancedCropCyclePredictionModel)
+from model_backends import RandomForestBackend, get_backend
+
+# ====== CONFIG ======
+N_FOLDS = 5
+KFOLD = 'kfold'
+TIME_ORDERED = 'time'
+MODES = (KFOLD, TIME_ORDERED)
+YIELD_TARGET = 'Actual_Yield'
+METRICS = ('r2', 'rmse', 'mae')
+
+
+def fold_indices(df, n_folds=N_FOLDS, mode=KFOLD, seed=SPLIT_SEED):
+    """List of (train_idx, test_idx) row positions.
+
+    kfold: shuffled KFold. time: rows sorted by Sowing_Date are cut into n_folds + 1
+    blocks and fold k tests block k + 1 after training on blocks 0..k. Each cut is moved
+    back to the first row of its sowing date, so one date never sits on both sides.
+    """
+    if mode == KFOLD:
+        return list(KFold(n_splits=n_folds, shuffle=True, random_state=seed).split(np.arange(len(df))))
+    if mode != TIME_ORDERED:
+        raise ValueError(f"Unknown cross-validation mode '{mode}'. Choose one of: {', '.join(MODES)}")
+
+    dates = pd.to_datetime(df['Sowing_Date']).to_numpy()
+    order = np.argsort(dates, kind='stable')
+    sorted_dates = dates[order]
+    cuts = np.linspace(0, len(df), n_folds + 2).astype(int)
+    cuts = np.searchsorted(sorted_dates, sorted_dates[np.minimum(cuts, len(df) - 1)], side='left')
+    cuts[0], cuts[-1] = 0, len(df)
+    folds = []
+    for k in range(1, n_folds + 1):
+        train, test = order[:cuts[k]], order[cuts[k]:cuts[k + 1]]
+        if len(train) == 0 or len(test) == 0:
+            raise ValueError(f"Too few distinct sowing dates for {n_folds} time-ordered folds")
+        folds.append((np.sort(train), np.sort(test)))
+    return folds
+
+
+# Worker state: set once per process by _init_worker
+_shared = {}
+
+
+def _init_worker(data_dir, backend_name):
+    from threadpoolctl import threadpool_limits
+
+    # One process per core already; keep OpenMP/BLAS from oversubscribing it
+    _shared['limits'] = threadpool_limits(1)
+    _shared['X'] = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    _shared['Y'] = np.load(os.path.join(data_dir, 'Y.npy'), mmap_mode='r')
+    _shared['train'] = np.load(os.path.join(data_dir, 'train.npy'), mmap_mode='r')
+    _shared['test'] = np.load(os.path.join(data_dir, 'test.npy'), mmap_mode='r')
+    _shared['backend'] = get_backend(backend_name)
+
+
+def _run_fold(task):
+    """Fit and score one target on one fold; returns its metrics and timings"""
+    target_i, fold, is_yield = task
+    # A fold's train / test rows are the entries of its row that are >= 0
+    train = _shared['train'][fold]
+    test = _shared['test'][fold]
+    train, test = train[train >= 0], test[test >= 0]
+    X, y = _shared['X'], _shared['Y'][:, target_i]
+    backend = _shared['backend']
+    model = backend.make_yield_model() if is_yield else backend.make_cycle_model()
+
+    start = time.perf_counter()
+    model.fit(X[train], y[train])
+    fit_s = time.perf_counter() - start
+    start = time.perf_counter()
+    y_pred = model.predict(X[test])
+    predict_s = time.perf_counter() - start
+    return {
+        'r2': r2_score(y[test], y_pred),
+        'rmse': float(np.sqrt(mean_squared_error(y[test], y_pred))),
+        'mae': mean_absolute_error(y[test], y_pred),
+        'fit_s': fit_s,
+        'predict_s': predict_s,
+    }
+
+
+def _padded(folds):
+    """(n_folds x max_len) index matrix, -1 padded"""
+    out = np.full((len(folds), max(len(f) for f in folds)), -1, dtype=np.int64)
+    for i, f in enumerate(folds):
+        out[i, :len(f)] = f
+    return out
+
+
+def cross_validate(df, n_folds=N_FOLDS, mode=KFOLD, backend=RandomForestBackend.name, workers=None):
+    """Cross-validated R² / RMSE / MAE (mean and std over folds) for the yield and phenology models"""
+    start = time.perf_counter()
+    targets = [YIELD_TARGET] + [t for t in PHENOLOGY_TARGETS if t in df.columns]
+    df = df.dropna(subset=[c for c in TRAINING_COLUMNS if c in df.columns] + targets).reset_index(drop=True)
+    folds = fold_indices(df, n_folds, mode)
+    X = EnhancedCropCyclePredictionModel().prepare_features(df).to_numpy(dtype=np.float64)
+    Y = df[targets].to_numpy(dtype=np.float64)
+    tasks = [(t, f, target == YIELD_TARGET) for t, target in enumerate(targets) for f in range(len(folds))]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        np.save(os.path.join(data_dir, 'X.npy'), X)
+        np.save(os.path.join(data_dir, 'Y.npy'), Y)
+        np.save(os.path.join(data_dir, 'train.npy'), _padded([train for train, _ in folds]))
+        np.save(os.path.join(data_dir, 'test.npy'), _padded([test for _, test in folds]))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_dir, backend)) as pool:
+            results = list(pool.map(_run_fold, tasks))
+    wall_s = time.perf_counter() - start
+
+    by_task = dict(zip([(t, f) for t, f, _ in tasks], results))
+    report_targets = {}
+    for t, target in enumerate(targets):
+        runs = [by_task[(t, f)] for f in range(len(folds))]
+        name = 'yield' if target == YIELD_TARGET else target
+        report_targets[name] = {
+            **{m: {'mean': round(float(np.mean([r[m] for r in runs])), 4),
+                   'std': round(float(np.std([r[m] for r in runs])), 4)} for m in METRICS},
+            'per_fold': {m: [round(float(r[m]), 4) for r in runs] for m in METRICS},
+            'fit_s_mean': round(float(np.mean([r['fit_s'] for r in runs])), 3),
+        }
+
+    fold_timing = []
+    dates = pd.to_datetime(df['Sowing_Date']) if 'Sowing_Date' in df.columns else None
+    for f, (train, test) in enumerate(folds):
+        runs = [by_task[(t, f)] for t in range(len(targets))]
+        timing = {
+            'fold': f,
+            'train_rows': int(len(train)),
+            'test_rows': int(len(test)),
+            'fit_s': round(sum(r['fit_s'] for r in runs), 3),
+            'predict_s': round(sum(r['predict_s'] for r in runs), 3),
+        }
+        if mode == TIME_ORDERED:
+            timing['test_sowing_dates'] = [str(dates.iloc[test].min().date()), str(dates.iloc[test].max().date())]
+        fold_timing.append(timing)
+
+    task_s = sum(r['fit_s'] + r['predict_s'] for r in results)
+    return {
+        'mode': mode,
+        'folds': len(folds),
+        'rows': int(len(df)),
+        'backend': backend,
+        'targets': report_targets,
+        'fold_timing': fold_timing,
+        'workers': workers,
+        'wall_s': round(wall_s, 2),
+        'task_s': round(task_s, 2),  # summed fit + predict time: roughly the serial cost
+    }
+
+
+def print_report(report):
+    print("\n" + "="*60)
+    print(f"📊 {report['folds']}-FOLD CROSS-VALIDATION ({report['mode']}, {report['backend']}, {report['rows']} rows)")
+    print("="*60)
+    for name, metrics in report['targets'].items():
+        print(f"  {name:<32} R² {metrics['r2']['mean']:.3f} ± {metrics['r2']['std']:.3f}   "
+              f"RMSE {metrics['rmse']['mean']:.3f} ± {metrics['rmse']['std']:.3f}")
+    print("\n  Fold  train   test   fit s")
+    for timing in report['fold_timing']:
+        print(f"  {timing['fold']:>4}  {timing['train_rows']:>5}  {timing['test_rows']:>5}  {timing['fit_s']:>6.2f}")
+    print(f"\n⏱️  {report['wall_s']:.1f}s wall, workers={report['workers']} "
+          f"({report['task_s']:.1f}s of fitting and scoring)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validate the yield and phenology models")
+    parser.add_argument('dataset', nargs='?', default='large_agri_dataset.csv')
+    parser.add_argument('--folds', type=int, default=N_FOLDS)
+    parser.add_argument('--mode', choices=MODES, default=KFOLD)
+    parser.add_argument('--backend', default=RandomForestBackend.name)
+    parser.add_argument('--workers', type=int, default=None, help="Processes (default: one per CPU)")
+    parser.add_argument('--json', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = cross_validate(pd.read_csv(args.dataset), args.folds, args.mode, args.backend, args.workers)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.json}")
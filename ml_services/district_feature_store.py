@@ -0,0 +1,170 @@
+# Precomputed per-district model inputs
+# Climate normals (Avg_Temp/Tmax/Tmin for every sowing week) and 0-30cm soil
+# properties are computed offline into .npy arrays (memory-mapped when served)
+# with a JSON index, so filling a request's features is a dictionary lookup plus
+# one row read, and a batch is a single fancy-indexing read.
+# Usage: python district_feature_store.py --weather Processed_AgriWeather.csv --soil soilgrids_district_zonal.csv
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from climatology import SowingClimatology, WEATHER_CSV
+from forecast_table import (DISTRICT_CSV, WEEKS, district_climatology, sowing_week, sowing_weeks,
+                            weekly_climatology)
+
+# ====== CONFIG ======
+STORE_DIR = os.environ.get('AGRI_DISTRICT_FEATURES_PATH', 'district_features')
+SOIL_CSV = 'soilgrids_district_zonal.csv'  # written by soilgrids_zonal_stats.py
+SOIL_SUFFIX = '_0_30'  # soil_field_name() in soilgrids_raster_lookup.py
+CLIMATE_FIELDS = ['avg_temp', 'tmax', 'tmin']
+
+
+def _soil_fields(columns):
+    return [c for c in columns if c.endswith(SOIL_SUFFIX)]
+
+
+def build_feature_store(climatology, soil_csv=SOIL_CSV, district_csv=DISTRICT_CSV, out_dir=STORE_DIR):
+    """Write climate.npy, soil.npy and index.json for every district; returns the index.
+
+    With the SoilGrids district table, rows are its GADM districts (keyed by GID_2)
+    and each gets the climate normals of its state when the forecasting dataset
+    covers that state, else the national ones. Without it, rows are the regions of
+    the forecasting dataset and carry no soil.
+    """
+    regions, region_temps = district_climatology(climatology, district_csv)
+    region_row = {r.lower(): i for i, r in enumerate(regions)}
+
+    if soil_csv and os.path.exists(soil_csv):
+        soil = pd.read_csv(soil_csv)
+        fields = _soil_fields(soil.columns)
+        ids = soil['district_id'].astype(str).tolist()
+        names = soil['district_name'].astype(str).tolist()
+        states = soil['state_name'].astype(str).tolist()
+        rows = [region_row.get(s.lower()) for s in states]
+        national = weekly_climatology(climatology)
+        climate = np.stack([region_temps[r] if r is not None else national for r in rows])
+        sources = ['state' if r is not None else 'national' for r in rows]
+        soil_values = soil[fields].to_numpy(dtype=float)
+    else:
+        fields = []
+        ids, names, states = list(regions), list(regions), list(regions)
+        climate = region_temps
+        sources = ['district'] * len(regions)
+        soil_values = np.empty((len(regions), 0))
+
+    os.makedirs(out_dir, exist_ok=True)
+    # Write next to the live files and swap in, so a serving process never reads a partial store
+    for name, values in (('climate.npy', climate), ('soil.npy', soil_values)):
+        path = os.path.join(out_dir, name)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, np.asarray(values, dtype=np.float32))
+        os.replace(path + '.tmp', path)
+
+    index = {
+        'ids': ids,
+        'names': names,
+        'states': states,
+        'climate_source': sources,
+        'soil_fields': fields,
+        'weeks': WEEKS,
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    index_path = os.path.join(out_dir, 'index.json')
+    with open(index_path + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(index_path + '.tmp', index_path)
+    return index
+
+
+class DistrictFeatureStore:
+    """Memory-mapped district features with O(1) lookups by district id or name.
+
+    Names are matched case-insensitively; a name shared by districts in several
+    states resolves only as 'name, state' (or by id).
+    """
+
+    def __init__(self, climate, soil, index):
+        self.climate = climate
+        self.soil = soil
+        self.index = index
+        self._rows = {}
+        seen = {}
+        for i, (name, state) in enumerate(zip(index['names'], index['states'])):
+            seen.setdefault(name.lower(), []).append(i)
+            self._rows[f"{name}, {state}".lower()] = i
+        self._rows.update({name: rows[0] for name, rows in seen.items() if len(rows) == 1})
+        self._rows.update({d.lower(): i for i, d in enumerate(index['ids'])})
+
+    @classmethod
+    def load(cls, path=STORE_DIR):
+        with open(os.path.join(path, 'index.json')) as f:
+            index = json.load(f)
+        return cls(np.load(os.path.join(path, 'climate.npy'), mmap_mode='r'),
+                   np.load(os.path.join(path, 'soil.npy'), mmap_mode='r'), index)
+
+    def __len__(self):
+        return len(self.index['ids'])
+
+    def row(self, district):
+        """Row of a district id / name, or None when unknown"""
+        return self._rows.get(str(district).strip().lower())
+
+    def _soil(self, i):
+        if not self.index['soil_fields']:
+            return None
+        return {f: None if np.isnan(v) else round(float(v), 2)
+                for f, v in zip(self.index['soil_fields'], self.soil[i].tolist())}
+
+    def _features(self, i, week, temps):
+        return {
+            'district_id': self.index['ids'][i],
+            'district': self.index['names'][i],
+            'state': self.index['states'][i],
+            'climate_source': self.index['climate_source'][i],
+            'sowing_week': int(week),
+            **{name: round(float(v), 2) for name, v in zip(CLIMATE_FIELDS, temps)},
+            'soil': self._soil(i),
+        }
+
+    def lookup(self, district, sowing_date=None):
+        """Features of one district for a sowing date (default today), or None for an unknown district"""
+        i = self.row(district)
+        if i is None:
+            return None
+        week = sowing_week(sowing_date or datetime.now())
+        return self._features(i, week, self.climate[i, week].tolist())
+
+    def lookup_many(self, districts, sowing_dates=None):
+        """Features for parallel lists of districts and sowing dates (None = today).
+
+        Raises ValueError naming the first unknown district.
+        """
+        rows = []
+        for district in districts:
+            i = self.row(district)
+            if i is None:
+                raise ValueError(f"Unknown district '{district}'")
+            rows.append(i)
+        today = datetime.now().strftime('%Y-%m-%d')
+        dates = [d or today for d in sowing_dates] if sowing_dates is not None else [today] * len(rows)
+        weeks = sowing_weeks(dates)
+        temps = np.asarray(self.climate[np.asarray(rows, dtype=np.intp), weeks]).tolist()
+        return [self._features(i, w, t) for i, w, t in zip(rows, weeks, temps)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute per-district climate normals and soil properties")
+    parser.add_argument('--weather', default=WEATHER_CSV)
+    parser.add_argument('--districts', default=DISTRICT_CSV)
+    parser.add_argument('--soil', default=SOIL_CSV)
+    parser.add_argument('--out', default=STORE_DIR)
+    args = parser.parse_args()
+
+    index = build_feature_store(SowingClimatology.from_csv(args.weather), args.soil, args.districts, args.out)
+    print(f"✅ District features: {len(index['ids'])} districts x {index['weeks']} weeks, "
+          f"{len(index['soil_fields'])} soil fields -> {args.out}")
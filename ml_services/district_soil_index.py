@@ -0,0 +1,124 @@
+# district_soil_index.py
+# lat/lon -> district + soil lookups for the API (STRtree over GADM district polygons)
+import copy
+import math
+import os
+from functools import lru_cache
+
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+from soilgrids_districts import DIST_LAYER, DIST_SHAPEFILE
+from soilgrids_raster_lookup import PROPERTIES_TO_EXTRACT, RASTER_DIR, SoilGridsRasterSampler, soil_field_name
+
+# ====== CONFIG ======
+DISTRICT_SOIL_CSV = "soilgrids_district_zonal.csv"  # written by soilgrids_zonal_stats.py
+COORD_PRECISION = 4  # ~11 m; coordinates are rounded before hitting the LRU cache
+LRU_CACHE_SIZE = 4096
+# ====================
+
+
+def read_district_polygons(shapefile=DIST_SHAPEFILE, layer=DIST_LAYER):
+    """Read GADM district polygons with fiona (no GeoDataFrame)"""
+    import fiona
+
+    path = f"zip://{shapefile}" if shapefile.endswith('.zip') else shapefile
+    records, geoms = [], []
+    with fiona.open(path, layer=layer) as src:
+        for feat in src:
+            props = feat['properties']
+            records.append({
+                'district_id': props['GID_2'],
+                'district_name': props['NAME_2'],
+                'state_name': props['NAME_1'],
+            })
+            geoms.append(shape(feat['geometry']))
+    return records, geoms
+
+def read_soil_table(path=DISTRICT_SOIL_CSV):
+    """District soil table keyed by district_id, with NaN mapped to None"""
+    df = pd.read_csv(path)
+    fields = [soil_field_name(p) for p in PROPERTIES_TO_EXTRACT if soil_field_name(p) in df.columns]
+    df = df.set_index('district_id')[fields].astype(object)
+    df = df.where(df.notna(), None)
+    return df.to_dict(orient='index')
+
+
+class DistrictSoilIndex:
+    """Resolves a point to its district and soil profile.
+
+    District polygons live in a shapely STRtree built once at startup, so a query
+    only runs point-in-polygon tests against the few candidates whose envelopes
+    contain the point. Soil comes from the precomputed district table, or from
+    the local rasters when no table is available. Results for hot coordinates
+    are memoized in an LRU cache keyed by the rounded lon/lat.
+    """
+
+    def __init__(self, records, geometries, soil_table=None, raster_sampler=None,
+                 cache_size=LRU_CACHE_SIZE, precision=COORD_PRECISION):
+        self.records = records
+        self.geometries = geometries
+        self.tree = shapely.STRtree(geometries)
+        self.soil_table = soil_table
+        self.raster_sampler = raster_sampler
+        self.precision = precision
+        self._cached_resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    @classmethod
+    def from_files(cls, shapefile=DIST_SHAPEFILE, layer=DIST_LAYER, soil_csv=DISTRICT_SOIL_CSV,
+                   raster_dir=RASTER_DIR, cache_size=LRU_CACHE_SIZE):
+        records, geoms = read_district_polygons(shapefile, layer)
+        soil_table, sampler = None, None
+        if soil_csv and os.path.exists(soil_csv):
+            soil_table = read_soil_table(soil_csv)
+        else:
+            try:
+                sampler = SoilGridsRasterSampler(raster_dir)
+            except ValueError as e:
+                print(f"District index without soil data: {e}")
+        return cls(records, geoms, soil_table, sampler, cache_size)
+
+    @property
+    def soil_source(self):
+        if self.soil_table is not None:
+            return 'district_table'
+        if self.raster_sampler is not None:
+            return 'raster'
+        return None
+
+    def lookup(self, lon, lat):
+        """District and soil for a WGS84 point; district is None outside all polygons"""
+        lon, lat = float(lon), float(lat)
+        if not (math.isfinite(lon) and math.isfinite(lat)) or not (-180 <= lon <= 180 and -90 <= lat <= 90):
+            raise ValueError(f"Invalid coordinates: lon={lon}, lat={lat}")
+        # Copy: the cached result is shared by every caller of the same point
+        return copy.deepcopy(self._cached_resolve(round(lon, self.precision), round(lat, self.precision)))
+
+    def cache_info(self):
+        return self._cached_resolve.cache_info()
+
+    def _resolve(self, lon, lat):
+        hits = self.tree.query(shapely.points(lon, lat), predicate='within')
+        if len(hits) == 0:
+            return {'lon': lon, 'lat': lat, 'district': None, 'soil': None, 'soil_source': None}
+
+        record = self.records[int(hits.min())]
+        soil = None
+        if self.soil_table is not None:
+            soil = self.soil_table.get(record['district_id'])
+        elif self.raster_sampler is not None:
+            sample = self.raster_sampler.sample_point(lon, lat)
+            soil = {k: v for k, v in sample.items() if k not in ('lon', 'lat')}
+
+        return {
+            'lon': lon,
+            'lat': lat,
+            'district': {
+                'id': record['district_id'],
+                'name': record['district_name'],
+                'state': record['state_name'],
+            },
+            'soil': soil,
+            'soil_source': self.soil_source if soil is not None else None,
+        }
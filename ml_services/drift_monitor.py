@@ -0,0 +1,203 @@
+# Input drift monitoring for the prediction endpoints
+# Training snapshots the input distribution (quantile-bin histograms of the
+# temperature features, counts per crop) into the model artifact; serving keeps
+# fixed-size live histograms over the same bins and scores the difference with
+# the population stability index (PSI). Memory is constant whatever the traffic.
+
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+# ====== CONFIG ======
+REFERENCE_BINS = 10          # quantile bins per feature (deciles of the training data)
+WINDOW_RECORDS = 5000        # live records per recent window; recent drift uses the last two windows
+MIN_RECORDS = 200            # fewer live records than this: status is 'insufficient_data'
+PSI_THRESHOLDS = (0.1, 0.25)  # stable below the first, significant above the second
+FEATURES = {'avg_temp': 'Avg_Temp', 'tmax': 'Tmax', 'tmin': 'Tmin'}
+REPORT_QUANTILES = (0.05, 0.5, 0.95)
+OTHER_CROP = '(other)'
+
+
+def build_reference(df, bins=REFERENCE_BINS):
+    """Reference distribution of the model inputs in a training DataFrame"""
+    features = {}
+    for name, column in FEATURES.items():
+        values = df[column].dropna().to_numpy(dtype=float)
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        features[name] = {
+            'edges': edges.tolist(),
+            'counts': counts.tolist(),
+            'min': float(values.min()),
+            'max': float(values.max()),
+            'quantiles': dict(zip(map(str, REPORT_QUANTILES), np.quantile(values, REPORT_QUANTILES).round(2).tolist())),
+        }
+    crops = df['Crop_Type'].value_counts()
+    return {'features': features, 'crops': {str(k): int(v) for k, v in crops.items()}, 'rows': int(len(df))}
+
+
+def extend_reference(reference, df_new):
+    """Reference with rows appended to the training data added (bin edges unchanged)"""
+    extended = {'features': {}, 'crops': dict(reference['crops']), 'rows': reference['rows'] + int(len(df_new))}
+    for name, column in FEATURES.items():
+        ref = reference['features'][name]
+        values = df_new[column].dropna().to_numpy(dtype=float)
+        counts = np.bincount(np.searchsorted(ref['edges'], values, side='right'), minlength=len(ref['counts']))
+        extended['features'][name] = {
+            **ref,
+            'counts': (np.asarray(ref['counts']) + counts).tolist(),
+            'min': min(ref['min'], float(values.min())) if len(values) else ref['min'],
+            'max': max(ref['max'], float(values.max())) if len(values) else ref['max'],
+        }
+    for crop, count in df_new['Crop_Type'].value_counts().items():
+        extended['crops'][str(crop)] = extended['crops'].get(str(crop), 0) + int(count)
+    return extended
+
+
+def psi(expected, actual, eps=1e-4):
+    """Population stability index between two count vectors over the same bins"""
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return None
+    e = np.clip(expected / expected.sum(), eps, None)
+    a = np.clip(actual / actual.sum(), eps, None)
+    return round(float(((a - e) * np.log(a / e)).sum()), 4)
+
+
+def drift_status(score, n_records):
+    if score is None or n_records < MIN_RECORDS:
+        return 'insufficient_data'
+    if score < PSI_THRESHOLDS[0]:
+        return 'stable'
+    return 'moderate' if score < PSI_THRESHOLDS[1] else 'significant'
+
+
+def _histogram_quantiles(counts, edges, low, high):
+    """Approximate quantiles of binned values, interpolating linearly inside each bin"""
+    counts = np.asarray(counts, dtype=float)
+    if counts.sum() == 0:
+        return None
+    bounds = np.concatenate([[low], edges, [high]])
+    cumulative = np.concatenate([[0], np.cumsum(counts) / counts.sum()])
+    return dict(zip(map(str, REPORT_QUANTILES), np.interp(REPORT_QUANTILES, cumulative, bounds).round(2).tolist()))
+
+
+class _Counts:
+    """Live histogram counts for every feature plus crop counts"""
+
+    def __init__(self, features, crops):
+        self.features = {name: [0] * (len(ref['edges']) + 1) for name, ref in features.items()}
+        self.out_of_range = dict.fromkeys(features, 0)
+        self.crops = dict.fromkeys(crops, 0)
+        self.crops[OTHER_CROP] = 0
+        self.n = 0
+
+    def add(self, other):
+        for name, counts in other.features.items():
+            self.features[name] = [a + b for a, b in zip(self.features[name], counts)]
+            self.out_of_range[name] += other.out_of_range[name]
+        for crop, count in other.crops.items():
+            self.crops[crop] += count
+        self.n += other.n
+        return self
+
+
+class DriftMonitor:
+    """Live input histograms over the reference bins, updated in O(1) per record"""
+
+    def __init__(self, reference, window=WINDOW_RECORDS):
+        self.reference = reference
+        self.window = window
+        self.started = time.strftime('%Y-%m-%d %H:%M:%S')
+        self._edges = {name: ref['edges'] for name, ref in reference['features'].items()}
+        self._ranges = {name: (ref['min'], ref['max']) for name, ref in reference['features'].items()}
+        self._lock = threading.Lock()
+        self.lifetime = self._new_counts()
+        self.current = self._new_counts()
+        self.previous = self._new_counts()
+
+    def _new_counts(self):
+        return _Counts(self.reference['features'], self.reference['crops'])
+
+    def _rotate(self):
+        if self.current.n >= self.window:
+            self.previous, self.current = self.current, self._new_counts()
+
+    def record(self, crop_type, avg_temp, tmax, tmin):
+        """Count one request's inputs"""
+        values = {'avg_temp': avg_temp, 'tmax': tmax, 'tmin': tmin}
+        crop = crop_type if crop_type in self.lifetime.crops else OTHER_CROP
+        with self._lock:
+            for counts in (self.lifetime, self.current):
+                for name, value in values.items():
+                    counts.features[name][bisect_right(self._edges[name], value)] += 1
+                    low, high = self._ranges[name]
+                    if not low <= value <= high:
+                        counts.out_of_range[name] += 1
+                counts.crops[crop] += 1
+                counts.n += 1
+            self._rotate()
+
+    def record_many(self, crop_types, temperatures):
+        """Count a batch: crop types and an (n x 3) avg_temp/tmax/tmin array"""
+        temperatures = np.asarray(temperatures, dtype=float).reshape(-1, 3)
+        batch = self._new_counts()
+        for j, name in enumerate(FEATURES):
+            values = temperatures[:, j]
+            bins = np.searchsorted(self._edges[name], values, side='right')
+            batch.features[name] = np.bincount(bins, minlength=len(self._edges[name]) + 1).tolist()
+            low, high = self._ranges[name]
+            batch.out_of_range[name] = int(((values < low) | (values > high)).sum())
+        for crop in crop_types:
+            batch.crops[crop if crop in batch.crops else OTHER_CROP] += 1
+        batch.n = len(temperatures)
+        with self._lock:
+            self.lifetime.add(batch)
+            self.current.add(batch)
+            self._rotate()
+
+    def report(self):
+        """PSI per feature and for the crop mix, over all live records and the recent windows"""
+        with self._lock:
+            lifetime = self._new_counts().add(self.lifetime)
+            recent = self._new_counts().add(self.previous).add(self.current)
+
+        features = {}
+        for name, ref in self.reference['features'].items():
+            recent_psi = psi(ref['counts'], recent.features[name])
+            features[name] = {
+                'psi': psi(ref['counts'], lifetime.features[name]),
+                'recent_psi': recent_psi,
+                'status': drift_status(recent_psi, recent.n),
+                'out_of_range_share': round(recent.out_of_range[name] / recent.n, 4) if recent.n else None,
+                'reference_quantiles': ref['quantiles'],
+                'recent_quantiles': _histogram_quantiles(recent.features[name], ref['edges'], ref['min'], ref['max']),
+            }
+
+        crops = list(self.reference['crops']) + [OTHER_CROP]
+        reference_crops = [self.reference['crops'].get(c, 0) for c in crops]
+        recent_crops = [recent.crops[c] for c in crops]
+        recent_crop_psi = psi(reference_crops, recent_crops)
+        crop_type = {
+            'psi': psi(reference_crops, [lifetime.crops[c] for c in crops]),
+            'recent_psi': recent_crop_psi,
+            'status': drift_status(recent_crop_psi, recent.n),
+            'reference_share': {c: round(n / sum(reference_crops), 4) for c, n in zip(crops, reference_crops)},
+            'recent_share': {c: round(n / recent.n, 4) if recent.n else None for c, n in zip(crops, recent_crops)},
+        }
+
+        order = ['insufficient_data', 'stable', 'moderate', 'significant']
+        statuses = [f['status'] for f in features.values()] + [crop_type['status']]
+        return {
+            'status': max(statuses, key=order.index),
+            'records': lifetime.n,
+            'recent_records': recent.n,
+            'window_records': self.window,
+            'since': self.started,
+            'reference_rows': self.reference['rows'],
+            'features': features,
+            'crop_type': crop_type,
+        }
@@ -0,0 +1,93 @@
+# Per-prediction feature contributions for tree ensembles
+# Each prediction is decomposed along its decision paths: starting from the
+# root value (bias), every split adds the change in node value to the feature
+# it split on. Summing over the path gives prediction = bias + sum(contributions).
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Same groups training.py shows in the UI, plus this model's Tmax/Tmin columns
+FEATURE_GROUPS = {
+    "Rain": ["Rainfall", "Total_Rainfall", "Rainfall_mm"],
+    "Temp": ["Temperature", "Avg_Temp", "Max_Temp", "Min_Temp", "Tmax", "Tmin"],
+    "Soil": ["Soil_Moisture", "Soil_Type_Index"],
+    "NDVI": ["NDVI", "NDVI_Mean"],
+    "Hist": ["Min_Yield_Last_3Years", "Max_Yield_Last_3Years", "Avg_Yield_Last_3Years"],
+}
+GROUP_PREFIXES = {"Crop": "Crop_"}
+
+
+def feature_group_matrix(feature_columns):
+    """Group names and a (n_features x n_groups) 0/1 matrix; ungrouped features keep their own name"""
+    groups = []
+    for i, col in enumerate(feature_columns):
+        name = next((g for g, cols in FEATURE_GROUPS.items() if col in cols), None)
+        if name is None:
+            name = next((g for g, prefix in GROUP_PREFIXES.items() if col.startswith(prefix)), col)
+        groups.append(name)
+
+    names = list(dict.fromkeys(groups))
+    matrix = np.zeros((len(feature_columns), len(names)))
+    matrix[np.arange(len(feature_columns)), [names.index(g) for g in groups]] = 1.0
+    return names, matrix
+
+
+class ForestExplainer:
+    """Batch path decomposition for a random forest or a CompactForest.
+
+    For sklearn forests the per-node value changes are precomputed once into a
+    sparse (nodes x features) matrix, so a whole batch is explained with one
+    decision_path call and one sparse matrix product.
+    """
+
+    def __init__(self, forest):
+        self.forest = forest
+        if hasattr(forest, 'contributions'):
+            self._deltas = None
+            return
+        if not hasattr(forest, 'decision_path'):
+            raise ValueError("Per-prediction explanations need a random forest model")
+
+        rows, cols, vals, roots = [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            values = tree.value[:, 0, 0]
+            roots.append(values[0])
+            for children in (tree.children_left, tree.children_right):
+                parents = np.flatnonzero(children != -1)
+                rows.append(children[parents] + offset)
+                cols.append(tree.feature[parents])
+                vals.append(values[children[parents]] - values[parents])
+            offset += tree.node_count
+
+        self.n_trees = len(forest.estimators_)
+        self.bias = float(np.mean(roots))
+        self._deltas = csr_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(offset, forest.n_features_in_),
+        )
+
+    def contributions(self, X):
+        """(bias, contributions) with contributions shaped (n_samples, n_features)"""
+        if self._deltas is None:
+            return self.forest.contributions(X)
+        indicator, _ = self.forest.decision_path(X)
+        return self.bias, np.asarray((indicator @ self._deltas).todense()) / self.n_trees
+
+
+def grouped_explanations(bias, contributions, feature_columns, decimals=3):
+    """Per-record explanations with contributions summed per feature group"""
+    names, matrix = feature_group_matrix(feature_columns)
+    grouped = contributions @ matrix
+    order = np.argsort(-np.abs(grouped), axis=1, kind='stable')
+    bias = round(float(bias), decimals)
+    return [
+        {
+            "bias": bias,
+            "contributions": [
+                {"name": names[j], "impact": round(float(row[j]), decimals)} for j in row_order
+            ],
+        }
+        for row, row_order in zip(grouped, order)
+    ]
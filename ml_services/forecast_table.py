@@ -0,0 +1,149 @@
+# Precomputed forecast table: every (district, crop, sowing week) scored offline
+# The scores live in a .npy array (memory-mapped when served) with a JSON index,
+# so serving a climatological forecast is a dictionary lookup plus one row read.
+# Usage: python forecast_table.py --model agri_forecasting_model.pkl
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from climatology import SowingClimatology, WEATHER_CSV
+
+# ====== CONFIG ======
+DISTRICT_CSV = 'agri_forecasting_dataset.csv'
+TABLE_PATH = 'forecast_table.npy'
+INDEX_PATH = 'forecast_table.json'
+WEEKS = 52  # sowing week w starts on day-of-year 7*w + 1; the last week absorbs days 365-366
+
+
+def sowing_week(date):
+    """0-based sowing week of a date (string or datetime)"""
+    return min((pd.Timestamp(date).dayofyear - 1) // 7, WEEKS - 1)
+
+
+def sowing_weeks(dates):
+    """0-based sowing weeks of an array of dates"""
+    doy = pd.DatetimeIndex(np.asarray(dates, dtype='datetime64[D]')).dayofyear.to_numpy()
+    return np.minimum((doy - 1) // 7, WEEKS - 1)
+
+
+def weekly_climatology(climatology):
+    """(WEEKS x 3) national Avg_Temp/Tmax/Tmin for a representative (mid-week) sowing date of every week"""
+    mid_week = np.datetime64('2023-01-01') + (np.arange(WEEKS) * 7 + 3)  # a non-leap year
+    return climatology.temperatures(mid_week)
+
+
+def district_climatology(climatology, district_csv=DISTRICT_CSV):
+    """District names and (n_districts x WEEKS x 3) Avg_Temp/Tmax/Tmin per sowing week.
+
+    The district records only cover a few sowing months, so each district gets
+    the national weekly climatology shifted by its mean offset on the dates it
+    was observed.
+    """
+    records = pd.read_csv(district_csv, usecols=['District', 'Sowing_Date', 'Avg_Temp', 'Tmax', 'Tmin'])
+    records = records.dropna()
+    observed = records[['Avg_Temp', 'Tmax', 'Tmin']].to_numpy()
+    offsets = pd.DataFrame(observed - climatology.temperatures(records['Sowing_Date'].to_numpy()),
+                           columns=['Avg_Temp', 'Tmax', 'Tmin'])
+    offsets = offsets.groupby(records['District'].to_numpy()).mean()
+
+    national = weekly_climatology(climatology)
+    temps = national[None, :, :] + offsets.to_numpy()[:, None, :]
+    return offsets.index.tolist(), temps
+
+
+def build_forecast_table(model, climatology, district_csv=DISTRICT_CSV, table_path=TABLE_PATH,
+                         index_path=INDEX_PATH):
+    """Score every district x crop x sowing week and write the table + index; returns the index"""
+    districts, temps = district_climatology(climatology, district_csv)
+    crops = [c[len('Crop_'):] for c in model.feature_columns if c.startswith('Crop_')]
+
+    X = model._grid_features(crops, temps.reshape(-1, 3))
+    yield_preds, ci_lower, ci_upper, cycle_preds = model._score(X)
+
+    columns = ['yield_t_ha', 'ci_lower', 'ci_upper', *cycle_preds, 'avg_temp', 'tmax', 'tmin']
+    scenario_temps = np.tile(temps.reshape(-1, 3), (len(crops), 1))
+    values = np.column_stack([yield_preds, ci_lower, ci_upper, *cycle_preds.values(), scenario_temps])
+    # Rows are crop-major (crop, district, week); store as (district, crop, week, column)
+    values = values.reshape(len(crops), len(districts), WEEKS, len(columns)).transpose(1, 0, 2, 3)
+
+    # Write next to the live files and swap in, so a serving process never reads a partial table
+    tmp_path = table_path + '.tmp'
+    table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=values.shape)
+    table[:] = values
+    table.flush()
+    del table
+    os.replace(tmp_path, table_path)
+
+    index = {
+        'districts': districts,
+        'crops': crops,
+        'weeks': WEEKS,
+        'columns': columns,
+        'day_columns': list(cycle_preds),
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'model_backend': model.backend,
+        'model_rows': model.training_rows,
+    }
+    with open(index_path + '.tmp', 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(index_path + '.tmp', index_path)
+    return index
+
+
+class ForecastTable:
+    """Memory-mapped forecast table with O(1) (district, crop, week) lookups"""
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+        self._districts = {d.lower(): i for i, d in enumerate(index['districts'])}
+        self._crops = {c.lower(): i for i, c in enumerate(index['crops'])}
+        self._day_columns = set(index['day_columns'])
+
+    @classmethod
+    def load(cls, table_path=TABLE_PATH, index_path=INDEX_PATH):
+        with open(index_path) as f:
+            index = json.load(f)
+        return cls(np.load(table_path, mmap_mode='r'), index)
+
+    def lookup(self, district, crop_type, week):
+        """Forecast row as a dict, or None for an unknown district / crop"""
+        d = self._districts.get(str(district).lower())
+        c = self._crops.get(str(crop_type).lower())
+        if d is None or c is None:
+            return None
+        row = self.table[d, c, week].tolist()
+        return {
+            'district': self.index['districts'][d],
+            'crop_type': self.index['crops'][c],
+            'sowing_week': week,
+            'forecast': {
+                name: int(v) if name in self._day_columns else round(v, 2)
+                for name, v in zip(self.index['columns'], row)
+            },
+        }
+
+
+if __name__ == "__main__":
+    from integrated_crop_prediction_training import EnhancedCropCyclePredictionModel
+
+    parser = argparse.ArgumentParser(description="Precompute the district x crop x sowing-week forecast table")
+    parser.add_argument('--model', default='agri_forecasting_model.pkl')
+    parser.add_argument('--weather', default=WEATHER_CSV)
+    parser.add_argument('--districts', default=DISTRICT_CSV)
+    parser.add_argument('--out', default=TABLE_PATH)
+    parser.add_argument('--index', default=INDEX_PATH)
+    args = parser.parse_args()
+
+    model = EnhancedCropCyclePredictionModel.load_model(args.model)
+    if model is None:
+        raise SystemExit(f"Could not load {args.model}")
+    index = build_forecast_table(model, SowingClimatology.from_csv(args.weather), args.districts, args.out, args.index)
+    size_kb = os.path.getsize(args.out) / 1024
+    print(f"✅ Forecast table: {len(index['districts'])} districts x {len(index['crops'])} crops x "
+          f"{index['weeks']} weeks -> {args.out} ({size_kb:.0f} KB)")
@@ -2,31 +2,129 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 from datetime import datetime, timedelta
+import copy
 import json
 import pickle
+import time
 import warnings
+from drift_monitor import build_reference, extend_reference
+from memory_profile import print_memory_summary
+from explanations import ForestExplainer, feature_group_matrix, grouped_explanations
+from model_backends import (CI_LOWER_PCT, CI_UPPER_PCT, CYCLE_TREES, INTERVAL_MODES, QUANTILE_FOREST,
+                            TREE_PERCENTILE, YIELD_TREES, RandomForestBackend, get_backend)
+from quantile_forest import QuantileForestSketch
+from training_cache import cache_key, estimator_signature, frame_hash
 warnings.filterwarnings('ignore')
 
-# Load the large synthetic dataset
-df = pd.read_csv('large_agri_dataset.csv')
+PHENOLOGY_TARGETS = [
+    'Days_To_Maturity',
+    'Total_Season_Length_Predicted',
+    'Germination_Days_From_Sowing',
+    'Reproductive_Days_From_Sowing',
+    'Grain_Filling_Days_From_Sowing'
+]
+
+# Columns the models are trained on (besides PHENOLOGY_TARGETS)
+TRAINING_COLUMNS = ['Crop_Type', 'Avg_Temp', 'Tmax', 'Tmin', 'Actual_Yield']
+
+# Held-out split shared by all targets
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
+MODEL_VERSION = '2.1'
+
+# Growth stages (BBCH code -> name) and base temperature of every crop
+PHENOLOGY_DATA = {
+    'Rice': {'base_temp': 10, 'stages': {0: 'Germination', 1: 'Leaf Development', 2: 'Tillering', 3: 'Stem Elongation', 5: 'Heading', 6: 'Flowering', 7: 'Grain Filling', 8: 'Maturity'}},
+    'Wheat': {'base_temp': 4, 'stages': {0: 'Germination', 1: 'Leaf Development', 2: 'Tillering', 3: 'Stem Elongation', 5: 'Heading', 6: 'Flowering', 7: 'Grain Filling', 8: 'Maturity'}},
+    'Maize': {'base_temp': 10, 'stages': {0: 'Germination', 1: 'Leaf Development', 3: 'Stem Elongation', 5: 'Tasseling', 6: 'Silking', 7: 'Grain Filling', 8: 'Maturity'}},
+    'Cotton': {'base_temp': 15, 'stages': {0: 'Germination', 1: 'Leaf Development', 3: 'Stem Elongation', 5: 'Squaring', 6: 'Flowering', 7: 'Boll Development', 8: 'Boll Opening'}},
+    'Soybean': {'base_temp': 10, 'stages': {0: 'Germination', 1: 'Leaf Development', 3: 'Stem Elongation', 6: 'Flowering', 7: 'Pod Development', 8: 'Maturity'}},
+    'Sugarcane': {'base_temp': 18, 'stages': {0: 'Germination', 1: 'Tillering', 3: 'Grand Growth', 8: 'Maturity'}}
+}
+
+# Growth stage timing as a share of the predicted season length, by BBCH code
+STAGE_PROPORTIONS = {
+    0: 0.06,   # Germination: 6% of season
+    1: 0.20,   # Leaf Development: 20%
+    2: 0.35,   # Tillering: 35%
+    3: 0.50,   # Stem Elongation: 50%
+    5: 0.65,   # Reproductive: 65%
+    6: 0.72,   # Flowering: 72%
+    7: 0.85,   # Grain Filling: 85%
+    8: 1.00    # Maturity: 100%
+}
+
+def sample_training_csv(path, max_rows, chunksize=100_000, random_state=42):
+    """Uniform random sample of at most `max_rows` rows of a training CSV, streamed in chunks.
+
+    Only the columns the models use are read, numbers as float32. Rows go through a
+    fixed-size reservoir (Algorithm R): the first `max_rows` fill it, then row t
+    replaces a random slot with probability max_rows / (t + 1). Peak memory is the
+    reservoir plus one chunk and each chunk costs O(chunksize). A file with at most
+    `max_rows` rows comes back whole and in order.
+    """
+    if not max_rows or int(max_rows) <= 0:
+        raise ValueError("max_rows must be a positive row cap")
+    max_rows = int(max_rows)
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [c for c in TRAINING_COLUMNS + PHENOLOGY_TARGETS if c in header]
+    numeric = [c for c in columns if c != 'Crop_Type']
+
+    rng = np.random.default_rng(random_state)
+    values = np.empty((max_rows, len(numeric)), dtype=np.float32)
+    crops = np.empty(max_rows, dtype=object)
+    seen = 0
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+        chunk_values = chunk[numeric].to_numpy(dtype=np.float32)
+        chunk_crops = chunk['Crop_Type'].to_numpy(dtype=object)
+        fill = min(max(max_rows - seen, 0), len(chunk))
+        values[seen:seen + fill] = chunk_values[:fill]
+        crops[seen:seen + fill] = chunk_crops[:fill]
+
+        rows = np.arange(fill, len(chunk))
+        slots = rng.integers(0, seen + rows + 1)  # row t draws from 0..t
+        taken = slots < max_rows
+        rows, slots = rows[taken], slots[taken]
+        # A slot drawn twice in one chunk keeps the later row, as the row-by-row algorithm would
+        _, last = np.unique(slots[::-1], return_index=True)
+        rows, slots = rows[::-1][last], slots[::-1][last]
+        values[slots] = chunk_values[rows]
+        crops[slots] = chunk_crops[rows]
+        seen += len(chunk)
+
+    n = min(seen, max_rows)
+    df = pd.DataFrame(values[:n], columns=numeric)
+    df['Crop_Type'] = crops[:n].astype(str)
+    df = df[columns]
+    if seen > max_rows:
+        df.attrs['sampled_from_rows'] = seen
+    return df
+
 
 class EnhancedCropCyclePredictionModel:
-    def __init__(self):
+    def __init__(self, backend=RandomForestBackend.name, interval_mode=QUANTILE_FOREST):
+        if interval_mode not in INTERVAL_MODES:
+            raise ValueError(f"Unknown interval mode '{interval_mode}'. Choose one of: {', '.join(INTERVAL_MODES)}")
+        self.backend = backend
+        self.interval_mode = interval_mode
         self.yield_model = None
+        self.yield_interval_models = None
+        self.yield_quantiles = None
         self.cycle_models = {}
+        self.feature_importances = None
         self.feature_columns = None
         self.metrics = {}
-        self.phenology_data = {
-            'Rice': {'base_temp': 10, 'stages': {0: 'Germination', 1: 'Leaf Development', 2: 'Tillering', 3: 'Stem Elongation', 5: 'Heading', 6: 'Flowering', 7: 'Grain Filling', 8: 'Maturity'}},
-            'Wheat': {'base_temp': 4, 'stages': {0: 'Germination', 1: 'Leaf Development', 2: 'Tillering', 3: 'Stem Elongation', 5: 'Heading', 6: 'Flowering', 7: 'Grain Filling', 8: 'Maturity'}},
-            'Maize': {'base_temp': 10, 'stages': {0: 'Germination', 1: 'Leaf Development', 3: 'Stem Elongation', 5: 'Tasseling', 6: 'Silking', 7: 'Grain Filling', 8: 'Maturity'}},
-            'Cotton': {'base_temp': 15, 'stages': {0: 'Germination', 1: 'Leaf Development', 3: 'Stem Elongation', 5: 'Squaring', 6: 'Flowering', 7: 'Boll Development', 8: 'Boll Opening'}},
-            'Soybean': {'base_temp': 10, 'stages': {0: 'Germination', 1: 'Leaf Development', 3: 'Stem Elongation', 6: 'Flowering', 7: 'Pod Development', 8: 'Maturity'}},
-            'Sugarcane': {'base_temp': 18, 'stages': {0: 'Germination', 1: 'Tillering', 3: 'Grand Growth', 8: 'Maturity'}}
-        }
+        self.training_rows = 0
+        self.training_sampled = False  # rows are a sample, not a prefix of the CSV
+        self.training_key = None
+        self.training_time_s = None
+        self.compaction = None
+        self.input_reference = None  # training input distribution, for drift monitoring
+        self._yield_explainer = None
+        self.phenology_data = copy.deepcopy(PHENOLOGY_DATA)
 
     def prepare_features(self, df_input):
         """Prepare features for training - using only basic features available at sowing"""
@@ -44,22 +142,75 @@ class EnhancedCropCyclePredictionModel:
 
         return feature_data
 
-    def train_models(self, df):
-        """Train yield and phenology prediction models"""
+    def _align_features(self, X):
+        """Reorder columns to the training layout, adding missing crop dummies as 0"""
+        return X.reindex(columns=self.feature_columns, fill_value=0)
+
+    def training_key_for(self, df):
+        """Hash of the training data and every setting that shapes the trained models"""
+        backend = get_backend(self.backend)
+        interval_models = backend.make_interval_models() or {}
+        columns = [c for c in TRAINING_COLUMNS + PHENOLOGY_TARGETS if c in df.columns]
+        return cache_key(
+            frame_hash(df[columns]),
+            estimator_signature(backend.make_yield_model()),
+            estimator_signature(backend.make_cycle_model()),
+            *(estimator_signature(m) for m in interval_models.values()),
+            self.interval_mode, TEST_SIZE, SPLIT_SEED, MODEL_VERSION,
+        )
+
+    def train_models(self, df, cache=None):
+        """Train yield and phenology prediction models.
+
+        With a TrainingCache, each fitted estimator (and the other expensive steps)
+        is reused when its inputs and hyperparameters match an earlier run.
+        """
         print("🚀 TRAINING ENHANCED CROP CYCLE PREDICTION MODELS")
         print("="*60)
+        start = time.perf_counter()
+        backend = get_backend(self.backend)
+        print(f"Backend: {backend.name}")
+        self._yield_explainer = None
+
+        hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
 
-        # Prepare features
+        def cached(name, compute, *key_parts):
+            if cache is None:
+                return compute()
+            return cache.get_or_compute(cache_key(name, *key_parts), compute)
+
+        # Prepare features and one train/test split shared by every target
         X = self.prepare_features(df)
         self.feature_columns = X.columns.tolist()
+        train_idx, test_idx = train_test_split(np.arange(len(X)), test_size=TEST_SIZE, random_state=SPLIT_SEED)
+        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+        train_key = frame_hash(X_train) if cache is not None else None
 
         # Train yield prediction model
         print("Training yield prediction model...")
         y_yield = df['Actual_Yield']
-        X_train, X_test, y_train, y_test = train_test_split(X, y_yield, test_size=0.2, random_state=42)
-
-        self.yield_model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=15)
-        self.yield_model.fit(X_train, y_train)
+        y_train, y_test = y_yield.iloc[train_idx], y_yield.iloc[test_idx]
+        y_train_key = frame_hash(y_train) if cache is not None else None
+
+        yield_model = backend.make_yield_model()
+        yield_key = (estimator_signature(yield_model), train_key, y_train_key)
+        self.yield_model = cached('fit', lambda: yield_model.fit(X_train, y_train), *yield_key)
+
+        # Dedicated CI models (quantile losses) for backends that provide them
+        self.yield_interval_models = backend.make_interval_models()
+        if self.yield_interval_models:
+            for name, interval_model in self.yield_interval_models.items():
+                self.yield_interval_models[name] = cached(
+                    'fit', lambda m=interval_model: m.fit(X_train, y_train),
+                    estimator_signature(interval_model), train_key, y_train_key)
+
+        # Quantile regression forest: sketch the training targets reaching every tree node
+        self.yield_quantiles = None
+        if not self.yield_interval_models and self.interval_mode == QUANTILE_FOREST:
+            self.yield_quantiles = cached(
+                'yield_quantiles',
+                lambda: QuantileForestSketch.fit(self.yield_model.estimators_, X_train, y_train),
+                *yield_key)
 
         # Evaluate yield model
         y_pred = self.yield_model.predict(X_test)
@@ -69,49 +220,162 @@ class EnhancedCropCyclePredictionModel:
 
         print(f"✅ Yield Model - R²: {r2_yield:.3f}, RMSE: {rmse_yield:.3f}")
 
-        # Train phenology models for different targets
-        phenology_targets = [
-            'Days_To_Maturity',
-            'Total_Season_Length_Predicted',
-            'Germination_Days_From_Sowing',
-            'Reproductive_Days_From_Sowing',
-            'Grain_Filling_Days_From_Sowing'
-        ]
+        self.feature_importances = cached(
+            'feature_importances',
+            lambda: backend.feature_importances(self.yield_model, X_test, y_test),
+            *yield_key, frame_hash(X_test) if cache is not None else None)
 
-        for target in phenology_targets:
+        # Train phenology models for different targets
+        for target in PHENOLOGY_TARGETS:
             if target in df.columns:
                 print(f"Training {target} prediction model...")
                 y_target = df[target]
+                y_train_t, y_test_t = y_target.iloc[train_idx], y_target.iloc[test_idx]
 
-                X_train_t, X_test_t, y_train_t, y_test_t = train_test_split(X, y_target, test_size=0.2, random_state=42)
-
-                model = RandomForestRegressor(n_estimators=80, random_state=42, max_depth=12)
-                model.fit(X_train_t, y_train_t)
+                model = backend.make_cycle_model()
+                model = cached('fit', lambda m=model: m.fit(X_train, y_train_t),
+                               estimator_signature(model), train_key,
+                               frame_hash(y_train_t) if cache is not None else None)
                 self.cycle_models[target] = model
 
                 # Evaluate model
-                y_pred_t = model.predict(X_test_t)
+                y_pred_t = model.predict(X_test)
                 r2_t = r2_score(y_test_t, y_pred_t)
                 rmse_t = np.sqrt(mean_squared_error(y_test_t, y_pred_t))
                 self.metrics[target] = {'r2': r2_t, 'rmse': rmse_t}
 
                 print(f"✅ {target} - R²: {r2_t:.3f}, RMSE: {rmse_t:.3f}")
 
+        self.training_rows = len(df)
+        self.training_sampled = bool(df.attrs.get('sampled_from_rows'))
+        self.training_key = self.training_key_for(df)
+        self.input_reference = build_reference(df)
+        self.training_time_s = time.perf_counter() - start
+
         print("\n🎯 MODEL TRAINING COMPLETE!")
-        print(f"   Trained {len(self.cycle_models) + 1} models successfully")
+        print(f"   Trained {len(self.cycle_models) + 1} models successfully in {self.training_time_s:.1f}s")
+        if cache is not None:
+            print(f"   Training cache: {cache.hits - hits} hits, {cache.misses - misses} misses")
+        print_memory_summary(self)
+
+    def train_models_from_csv(self, path, max_rows, chunksize=100_000, random_state=42, cache=None):
+        """Train on a uniform random sample of at most `max_rows` rows of a CSV that may not fit in memory"""
+        df = sample_training_csv(path, max_rows, chunksize, random_state)
+        print(f"📥 Streamed {path}: training on {len(df)} rows")
+        self.train_models(df, cache=cache)
+
+    def evaluate(self, df):
+        """R² / RMSE of the yield and phenology models on a labelled frame"""
+        X = self._align_features(self.prepare_features(df))
+        metrics = {}
+        models = {'yield': (self.yield_model, 'Actual_Yield'), **{t: (m, t) for t, m in self.cycle_models.items()}}
+        for name, (model, column) in models.items():
+            if column in df.columns:
+                y_pred = model.predict(X)
+                metrics[name] = {
+                    'r2': r2_score(df[column], y_pred),
+                    'rmse': np.sqrt(mean_squared_error(df[column], y_pred))
+                }
+        return metrics
+
+    @staticmethod
+    def _extend_forest(forest, X, y, n_new, max_trees):
+        """Warm-start `n_new` trees on (X, y), then retire the oldest trees beyond `max_trees`"""
+        n_old = len(forest.estimators_)
+        forest.set_params(warm_start=True, n_estimators=n_old + n_new)
+        forest.fit(X, y)
+        forest.set_params(warm_start=False)
+
+        retired = max(0, len(forest.estimators_) - max_trees)
+        if retired:
+            # estimators_ is in fit order, so the head holds the oldest trees
+            forest.estimators_ = forest.estimators_[retired:]
+            forest.set_params(n_estimators=len(forest.estimators_))
+        return retired
+
+    def update_models(self, df_new, new_tree_fraction=0.2, max_yield_trees=YIELD_TREES,
+                      max_cycle_trees=CYCLE_TREES):
+        """Incrementally update the forests with newly appended season records.
+
+        Each forest grows by `new_tree_fraction` of its size with trees fitted only on
+        `df_new`; the oldest trees are then retired so no forest exceeds its cap.
+        """
+        if self.yield_model is None:
+            raise ValueError("No trained model to update; run a full training first")
+        if self.compaction:
+            raise ValueError("Compacted models can't be updated incrementally; retrain and compact again")
+        if not get_backend(self.backend).supports_incremental:
+            raise ValueError(f"Incremental updates are not supported for the {self.backend} backend; run a full training")
+
+        print(f"🔁 INCREMENTAL UPDATE WITH {len(df_new)} NEW RECORDS")
+        start = time.perf_counter()
+        X_new = self._align_features(self.prepare_features(df_new))
+        self._yield_explainer = None
+
+        forests = {'yield': (self.yield_model, 'Actual_Yield', max_yield_trees)}
+        for target, model in self.cycle_models.items():
+            forests[target] = (model, target, max_cycle_trees)
+
+        trees = {}
+        for name, (forest, column, max_trees) in forests.items():
+            if column not in df_new.columns:
+                continue
+            n_new = max(1, int(round(len(forest.estimators_) * new_tree_fraction)))
+            retired = self._extend_forest(forest, X_new, df_new[column], n_new, max_trees)
+            if name == 'yield' and self.yield_quantiles is not None:
+                # Drop the retired trees' sketches and sketch the new trees on the rows they were fitted on
+                kept_new = min(n_new, len(forest.estimators_))
+                kept_old = self.yield_quantiles.keep_last_trees(len(forest.estimators_) - kept_new)
+                self.yield_quantiles = kept_old.append(
+                    QuantileForestSketch.fit(forest.estimators_[-kept_new:], X_new, df_new[column]))
+            trees[name] = {'added': n_new, 'retired': retired, 'total': len(forest.estimators_)}
+
+        elapsed = time.perf_counter() - start
+        previous_rows = self.training_rows
+        self.training_rows += len(df_new)
+        self.training_key = None  # no longer the result of a plain training run
+        if self.input_reference is not None:
+            self.input_reference = extend_reference(self.input_reference, df_new)
+
+        report = {
+            'mode': 'incremental',
+            'new_rows': len(df_new),
+            'total_rows': self.training_rows,
+            'update_time_s': round(elapsed, 3),
+            'trees': trees,
+        }
+        if self.training_time_s and previous_rows:
+            # Forest fit time grows roughly linearly with rows, so scale the last full fit
+            estimated_full = self.training_time_s * self.training_rows / previous_rows
+            report['estimated_full_retrain_time_s'] = round(estimated_full, 3)
+            report['estimated_time_saved_s'] = round(estimated_full - elapsed, 3)
+
+        print(f"✅ Updated {len(trees)} forests in {elapsed:.2f}s")
+        print_memory_summary(self)
+        return report
 
     def save_model(self, filename='agri_forecasting_model.pkl'):
         """Save the complete trained model to pickle file"""
         try:
             model_data = {
+                'backend': self.backend,
+                'interval_mode': self.interval_mode,
                 'yield_model': self.yield_model,
+                'yield_interval_models': self.yield_interval_models,
+                'yield_quantiles': self.yield_quantiles,
                 'cycle_models': self.cycle_models,
+                'feature_importances': self.feature_importances,
                 'feature_columns': self.feature_columns,
                 'metrics': self.metrics,
                 'phenology_data': self.phenology_data,
-                'model_version': '2.0',
+                'model_version': MODEL_VERSION,
+                'training_key': self.training_key,
                 'training_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'dataset_size': len(df)
+                'dataset_size': self.training_rows,
+                'training_sampled': self.training_sampled,
+                'training_time_s': self.training_time_s,
+                'compaction': self.compaction,
+                'input_reference': self.input_reference
             }
 
             with open(filename, 'wb') as f:
@@ -135,18 +399,31 @@ class EnhancedCropCyclePredictionModel:
                 model_data = pickle.load(f)
 
             # Create new instance
-            model = cls()
+            model = cls(backend=model_data.get('backend', RandomForestBackend.name),
+                        interval_mode=model_data.get('interval_mode', TREE_PERCENTILE))
 
             # Restore model components
             model.yield_model = model_data['yield_model']
+            model.yield_interval_models = model_data.get('yield_interval_models')
+            model.yield_quantiles = model_data.get('yield_quantiles')
+            model.feature_importances = model_data.get('feature_importances')
+            if model.feature_importances is None:
+                model.feature_importances = np.asarray(model.yield_model.feature_importances_)
             model.cycle_models = model_data['cycle_models']
             model.feature_columns = model_data['feature_columns']
             model.metrics = model_data['metrics']
             model.phenology_data = model_data['phenology_data']
+            model.training_rows = model_data.get('dataset_size') or 0
+            model.training_sampled = model_data.get('training_sampled', False)
+            model.training_key = model_data.get('training_key')
+            model.training_time_s = model_data.get('training_time_s')
+            model.compaction = model_data.get('compaction')
+            model.input_reference = model_data.get('input_reference')
 
             print(f"\n📂 MODEL LOADED SUCCESSFULLY!")
             print(f"   File: {filename}")
             print(f"   Version: {model_data.get('model_version', 'Unknown')}")
+            print(f"   Backend: {model.backend}")
             print(f"   Training Date: {model_data.get('training_date', 'Unknown')}")
             print(f"   Dataset Size: {model_data.get('dataset_size', 'Unknown')} records")
 
@@ -156,67 +433,69 @@ class EnhancedCropCyclePredictionModel:
             print(f"❌ ERROR LOADING MODEL: {str(e)}")
             return None
 
-    def predict_with_current_date(self, crop_type, avg_temp, tmax, tmin, sowing_date=None):
-        """Predict crop cycle using current date or specified sowing date"""
-
-        if sowing_date is None:
-            sowing_date = datetime.now().strftime('%Y-%m-%d')
-
-        # Prepare input features
+    def _yield_interval(self, X):
+        """Lower/upper yield bounds for every row of X"""
+        if self.yield_interval_models:
+            lower = self.yield_interval_models['lower'].predict(X)
+            upper = self.yield_interval_models['upper'].predict(X)
+            return np.minimum(lower, upper), np.maximum(lower, upper)
+
+        if self.yield_quantiles is not None:
+            lower, upper = self.yield_quantiles.quantiles(self.yield_model, X, [CI_LOWER_PCT / 100, CI_UPPER_PCT / 100])
+            return lower, upper
+
+        if self.compaction:
+            tree_preds = self.yield_model.predict_trees(X)
+        else:
+            tree_preds = np.array([tree.predict(X) for tree in self.yield_model.estimators_])
+        return np.percentile(tree_preds, CI_LOWER_PCT, axis=0), np.percentile(tree_preds, CI_UPPER_PCT, axis=0)
+
+    def _features_for_records(self, records):
+        """Model input matrix for a list of request records"""
         input_data = pd.DataFrame({
-            'Crop_Type': [crop_type],
-            'Avg_Temp': [avg_temp],
-            'Tmax': [tmax],
-            'Tmin': [tmin]
+            'Crop_Type': [r['crop_type'] for r in records],
+            'Avg_Temp': [float(r['avg_temp']) for r in records],
+            'Tmax': [float(r['tmax']) for r in records],
+            'Tmin': [float(r['tmin']) for r in records]
         })
 
-        X_input = self.prepare_features(input_data)
-
-        # Ensure all training features are present
-        for col in self.feature_columns:
-            if col not in X_input.columns:
-                X_input[col] = 0
+        # Ensure all training features are present, in training order
+        return self._align_features(self.prepare_features(input_data))
 
-        X_input = X_input[self.feature_columns]
-
-        # Predict yield
-        yield_pred = self.yield_model.predict(X_input)[0]
+    def _top_feature_importances(self, n=4):
+        feature_importances = [
+            {"name": self.feature_columns[i], "impact": round(float(importance), 3)}
+            for i, importance in enumerate(self.feature_importances)
+        ]
+        return sorted(feature_importances, key=lambda x: x['impact'], reverse=True)[:n]
 
-        # Get yield confidence interval
-        tree_preds = np.array([tree.predict(X_input)[0] for tree in self.yield_model.estimators_])
-        yield_ci_lower = np.percentile(tree_preds, 5)
-        yield_ci_upper = np.percentile(tree_preds, 95)
+    def _explainer(self):
+        if self._yield_explainer is None or self._yield_explainer.forest is not self.yield_model:
+            self._yield_explainer = ForestExplainer(self.yield_model)
+        return self._yield_explainer
 
-        # Predict phenological timing
-        predictions = {'yield': yield_pred}
-        for target, model in self.cycle_models.items():
-            predictions[target] = int(model.predict(X_input)[0])
+    def explain(self, X):
+        """Per-record yield contributions, grouped like the UI's feature groups"""
+        bias, contributions = self._explainer().contributions(X)
+        return grouped_explanations(bias, contributions, self.feature_columns)
 
+    def _format_prediction(self, crop_type, sowing_date, yield_pred, yield_ci_lower, yield_ci_upper,
+                           predictions, feature_importances):
+        """Response payload for one record"""
         # Calculate crop cycle dates
         sowing_dt = datetime.strptime(sowing_date, '%Y-%m-%d')
 
+        # Use predicted timing or defaults
+        season_length = predictions.get('Total_Season_Length_Predicted', 120)
+
         # Create growth stage timeline
         growth_stages = {}
         if crop_type in self.phenology_data:
             stages = self.phenology_data[crop_type]['stages']
 
-            # Use predicted timing or defaults
-            season_length = predictions.get('Total_Season_Length_Predicted', 120)
-
-            stage_proportions = {
-                0: 0.06,   # Germination: 6% of season
-                1: 0.20,   # Leaf Development: 20%
-                2: 0.35,   # Tillering: 35%
-                3: 0.50,   # Stem Elongation: 50%
-                5: 0.65,   # Reproductive: 65%
-                6: 0.72,   # Flowering: 72%
-                7: 0.85,   # Grain Filling: 85%
-                8: 1.00    # Maturity: 100%
-            }
-
             for stage_code, stage_name in stages.items():
-                if stage_code in stage_proportions:
-                    days_from_sowing = int(season_length * stage_proportions[stage_code])
+                if stage_code in STAGE_PROPORTIONS:
+                    days_from_sowing = int(season_length * STAGE_PROPORTIONS[stage_code])
                     stage_date = sowing_dt + timedelta(days=days_from_sowing)
 
                     growth_stages[f"stage_{stage_code}"] = {
@@ -232,13 +511,6 @@ class EnhancedCropCyclePredictionModel:
         harvest_start = maturity_date + timedelta(days=5)
         harvest_end = maturity_date + timedelta(days=15)
 
-        # Feature importance
-        feature_importances = [
-            {"name": self.feature_columns[i], "impact": round(importance, 3)}
-            for i, importance in enumerate(self.yield_model.feature_importances_)
-        ]
-        feature_importances = sorted(feature_importances, key=lambda x: x['impact'], reverse=True)[:4]
-
         return {
             "prediction": {
                 "yield_t_ha": round(yield_pred, 2),
@@ -257,12 +529,217 @@ class EnhancedCropCyclePredictionModel:
                 },
                 "growth_stages": growth_stages
             },
-            "feature_importances": feature_importances,
+            "feature_importances": [dict(f) for f in feature_importances],
             "explanation_text": f"Prediction for {crop_type} sown on {sowing_date}: {yield_pred:.1f} tons/ha expected yield with maturity in {days_to_maturity} days."
         }
 
+    def _score(self, X):
+        """Yield, its confidence interval and phenological timing for all rows at once"""
+        yield_preds = self.yield_model.predict(X)
+        ci_lower, ci_upper = self._yield_interval(X)
+        cycle_preds = {target: model.predict(X) for target, model in self.cycle_models.items()}
+        return yield_preds, ci_lower, ci_upper, cycle_preds
+
+    def predict_batch(self, records, explain=False):
+        """Predict many records with a single call per estimator.
+
+        Each record is a dict with crop_type, avg_temp, tmax, tmin and an optional
+        sowing_date; results have the same shape as predict_with_current_date.
+        """
+        X_input = self._features_for_records(records)
+        yield_preds, ci_lower, ci_upper, cycle_preds = self._score(X_input)
+        explanations = self.explain(X_input) if explain else None
+
+        feature_importances = self._top_feature_importances()
+        today = datetime.now().strftime('%Y-%m-%d')
+
+        results = []
+        for i, record in enumerate(records):
+            predictions = {target: int(preds[i]) for target, preds in cycle_preds.items()}
+            result = self._format_prediction(
+                record['crop_type'], record.get('sowing_date') or today,
+                yield_preds[i], ci_lower[i], ci_upper[i], predictions, feature_importances
+            )
+            if explanations is not None:
+                result["explanation"] = explanations[i]
+            results.append(result)
+        return results
+
+    def predict_columns(self, records, explain=False):
+        """Flat column-oriented predictions for bulk clients.
+
+        Returns one numpy array per column: yield and CI, each phenology target in
+        days, maturity/harvest dates and, per BBCH code, the stage's days from sowing
+        and date (masked / NaT for crops without that stage). With `explain`, adds a
+        bias column and one contribution column per feature group.
+        """
+        X_input = self._features_for_records(records)
+        yield_preds, ci_lower, ci_upper, cycle_preds = self._score(X_input)
+        n = len(records)
+
+        crops = np.array([r['crop_type'] for r in records], dtype=object)
+        today = datetime.now().strftime('%Y-%m-%d')
+        sowing = np.array([r.get('sowing_date') or today for r in records], dtype='datetime64[D]')
+
+        days = {target: preds.astype(np.int64) for target, preds in cycle_preds.items()}
+        season_length = days.get('Total_Season_Length_Predicted', np.full(n, 120))
+        days_to_maturity = days.get('Days_To_Maturity', season_length)
+        maturity = sowing + days_to_maturity
+
+        columns = {
+            'crop_type': crops,
+            'sowing_date': sowing,
+            'yield_t_ha': np.round(yield_preds, 2),
+            'ci_lower': np.round(ci_lower, 2),
+            'ci_upper': np.round(ci_upper, 2),
+            **days,
+            'days_to_maturity': days_to_maturity,
+            'predicted_maturity_date': maturity,
+            'harvest_start': maturity + 5,
+            'harvest_end': maturity + 15,
+        }
+
+        for stage_code, proportion in STAGE_PROPORTIONS.items():
+            crop_has_stage = {c: stage_code in self.phenology_data.get(c, {}).get('stages', {}) for c in set(crops)}
+            missing = ~np.array([crop_has_stage[c] for c in crops], dtype=bool)
+            stage_days = (season_length * proportion).astype(np.int64)
+            stage_dates = sowing + stage_days
+            stage_dates[missing] = np.datetime64('NaT')
+            columns[f'bbch_{stage_code}_days'] = np.ma.masked_array(stage_days, mask=missing)
+            columns[f'bbch_{stage_code}_date'] = stage_dates
+
+        if explain:
+            bias, contributions = self._explainer().contributions(X_input)
+            names, matrix = feature_group_matrix(self.feature_columns)
+            grouped = np.round(contributions @ matrix, 3)
+            columns['explain_bias'] = np.full(n, round(float(bias), 3))
+            for j, name in enumerate(names):
+                columns[f'explain_{name}'] = grouped[:, j]
+        return columns
+
+    def _grid_features(self, crop_types, temperatures):
+        """Model input for every (crop, temperature row) pair, crop-major"""
+        n = len(temperatures)
+        index = {name: j for j, name in enumerate(self.feature_columns)}
+        X = np.zeros((len(crop_types) * n, len(self.feature_columns)))
+        for j, name in enumerate(['Avg_Temp', 'Tmax', 'Tmin']):
+            X[:, index[name]] = np.tile(temperatures[:, j], len(crop_types))
+        for k, crop_type in enumerate(crop_types):
+            if f'Crop_{crop_type}' in index:
+                X[k * n:(k + 1) * n, index[f'Crop_{crop_type}']] = 1
+        return pd.DataFrame(X, columns=self.feature_columns)
+
+    def predict_sweep(self, crop_types, sowing_dates, base_temperatures, temp_offsets=(0,), window_days=14):
+        """Score every crop x sowing date x temperature offset in one pass.
+
+        `base_temperatures` is (n_dates x 3) Avg_Temp/Tmax/Tmin for each sowing date;
+        each offset shifts all three. The best window per crop is the run of dates
+        spanning `window_days` with the highest yield averaged over the offsets.
+        """
+        sowing_dates = np.asarray(sowing_dates, dtype='datetime64[D]')
+        offsets = np.asarray(temp_offsets, dtype=float)
+        shape = (len(crop_types), len(sowing_dates), len(offsets))
+
+        scenario_temps = np.asarray(base_temperatures)[:, None, :] + offsets[None, :, None]
+        X = self._grid_features(crop_types, scenario_temps.reshape(-1, 3))
+        yield_preds = self.yield_model.predict(X).reshape(shape)
+        ci_lower, ci_upper = (bound.reshape(shape) for bound in self._yield_interval(X))
+        maturity_model = self.cycle_models.get('Days_To_Maturity')
+        days_to_maturity = maturity_model.predict(X).astype(int).reshape(shape) if maturity_model else None
+
+        # Rank sowing dates by the yield expected across all temperature scenarios
+        expected = yield_preds.mean(axis=2)
+        worst_case = yield_preds.min(axis=2)
+        step_days = int(np.diff(sowing_dates).min().astype(int)) if len(sowing_dates) > 1 else 1
+        window = max(1, min(len(sowing_dates), window_days // max(step_days, 1) + 1))
+        window_means = np.lib.stride_tricks.sliding_window_view(expected, window, axis=1).mean(axis=2)
+
+        dates = np.datetime_as_string(sowing_dates, unit='D').tolist()
+        surface, best = {}, {}
+        for k, crop_type in enumerate(crop_types):
+            surface[crop_type] = {
+                "yield_t_ha": np.round(yield_preds[k], 2).tolist(),
+                "ci_lower": np.round(ci_lower[k], 2).tolist(),
+                "ci_upper": np.round(ci_upper[k], 2).tolist(),
+            }
+            if days_to_maturity is not None:
+                surface[crop_type]["days_to_maturity"] = days_to_maturity[k].tolist()
+
+            top = int(expected[k].argmax())
+            start = int(window_means[k].argmax())
+            best[crop_type] = {
+                "sowing_date": dates[top],
+                "expected_yield_t_ha": round(float(expected[k, top]), 2),
+                "worst_case_yield_t_ha": round(float(worst_case[k, top]), 2),
+                "window": {
+                    "start": dates[start],
+                    "end": dates[start + window - 1],
+                    "mean_yield_t_ha": round(float(window_means[k, start]), 2),
+                },
+            }
+
+        return {
+            "crop_types": list(crop_types),
+            "sowing_dates": dates,
+            "temp_offsets": offsets.tolist(),
+            "base_temperatures": {
+                name: np.round(np.asarray(base_temperatures)[:, j], 1).tolist()
+                for j, name in enumerate(['Avg_Temp', 'Tmax', 'Tmin'])
+            },
+            "scenarios": int(np.prod(shape)),
+            "surface": surface,
+            "best": best,
+        }
+
+    def predict_with_current_date(self, crop_type, avg_temp, tmax, tmin, sowing_date=None, explain=False):
+        """Predict crop cycle using current date or specified sowing date"""
+        record = {'crop_type': crop_type, 'avg_temp': avg_temp, 'tmax': tmax, 'tmin': tmin, 'sowing_date': sowing_date}
+        return self.predict_batch([record], explain=explain)[0]
+
+def compare_incremental_to_full(model, df_full, previous_rows, holdout_fraction=0.2, **update_kwargs):
+    """Update `model` in place with the rows after `previous_rows` and compare it to a full retrain.
+
+    A slice of the new rows is held out to score the two approaches: a copy of
+    `model` is updated and a fresh model is trained without it. `model` itself is
+    then updated with every new row, so its row count and input reference cover
+    all of `df_full` and the next incremental run starts after it.
+    """
+    df_new = df_full.iloc[previous_rows:]
+    new_fit, holdout = train_test_split(df_new, test_size=holdout_fraction, random_state=42)
+
+    trial = copy.deepcopy(model)
+    trial_report = trial.update_models(new_fit, **update_kwargs)
+
+    full_model = EnhancedCropCyclePredictionModel(backend=model.backend)
+    start = time.perf_counter()
+    full_model.train_models(pd.concat([df_full.iloc[:previous_rows], new_fit]))
+    full_time = time.perf_counter() - start
+
+    incremental_metrics = trial.evaluate(holdout)
+    full_metrics = full_model.evaluate(holdout)
+
+    report = model.update_models(df_new, **update_kwargs)
+    report['compared_update_time_s'] = trial_report['update_time_s']
+    report['full_retrain_time_s'] = round(full_time, 3)
+    report['time_saved_s'] = round(full_time - trial_report['update_time_s'], 3)
+    report['speedup'] = round(full_time / trial_report['update_time_s'], 1) if trial_report['update_time_s'] else None
+    report['holdout_rows'] = len(holdout)
+    report['accuracy'] = {
+        name: {
+            'incremental': incremental_metrics[name],
+            'full_retrain': full_metrics[name],
+            'r2_diff': incremental_metrics[name]['r2'] - full_metrics[name]['r2'],
+            'rmse_diff': incremental_metrics[name]['rmse'] - full_metrics[name]['rmse'],
+        }
+        for name in incremental_metrics if name in full_metrics
+    }
+    return report
+
 # Usage Example
 if __name__ == "__main__":
+    # Load the large synthetic dataset
+    df = pd.read_csv('large_agri_dataset.csv')
+
     # Initialize and train model
     model = EnhancedCropCyclePredictionModel()
     model.train_models(df)
@@ -0,0 +1,249 @@
+# Budget-constrained irrigation planning across growth stages
+# Allocates a seasonal water budget over the BBCH stages by dynamic programming
+# (stages x discrete water levels), maximising a yield-response proxy weighted by
+# each stage's irrigation priority. All fields in a call are solved together as
+# numpy arrays, so thousands of fields cost a handful of array operations per stage.
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from integrated_crop_prediction_training import PHENOLOGY_DATA, STAGE_PROPORTIONS
+from irrigation_scheduling_integration import IRRIGATION_NEEDS
+
+# ====== CONFIG ======
+WATER_LEVELS = 40           # budget resolution: each field's budget is split into this many units
+CHUNK_FIELDS = 1024         # fields solved per DP pass (bounds the n x levels x levels work array)
+DEFAULT_SEASON_DAYS = 120   # when no crop cycle is given (the model's default season length)
+EFFECTIVE_RAIN = 0.6        # share of forecast rain that offsets irrigation
+PRIORITY_WEIGHTS = {'critical': 1.0, 'high': 0.7, 'medium': 0.45, 'low': 0.2}
+AMOUNT_FACTORS = {'light': 0.6, 'moderate': 1.0, 'heavy': 1.3}  # relative to the crop's base daily need
+BASE_MM_PER_14_DAYS = {'rice': 120, 'wheat': 80, 'maize': 100, 'corn': 100, 'sugarcane': 180}
+DEFAULT_BASE_MM_PER_14_DAYS = 90
+# Stage names for crops without phenology data (every irrigated stage is planned)
+STAGE_NAMES = {0: 'Germination', 1: 'Leaf Development', 2: 'Tillering', 3: 'Stem Elongation',
+               5: 'Heading', 6: 'Flowering', 7: 'Grain Filling', 8: 'Maturity'}
+
+STAGE_CODES = sorted(IRRIGATION_NEEDS)
+STAGE_WEIGHTS = np.array([PRIORITY_WEIGHTS[IRRIGATION_NEEDS[c]['priority']] for c in STAGE_CODES])
+STAGE_AMOUNTS = np.array([AMOUNT_FACTORS[IRRIGATION_NEEDS[c]['amount']] for c in STAGE_CODES])
+
+
+def crop_base_mm(crop):
+    """Irrigation need of a crop over a two-week window (mm)"""
+    crop_lc = (crop or "").lower()
+    for name, base_mm in BASE_MM_PER_14_DAYS.items():
+        if name in crop_lc:
+            return base_mm
+    return DEFAULT_BASE_MM_PER_14_DAYS
+
+
+def soil_factor(soil):
+    """Multiplier on irrigation need from soil type and drainage"""
+    soil_type = (soil or {}).get("type", "").lower()
+    drainage = (soil or {}).get("drainage", "").lower()
+    factor = 1.0
+    if "clay" in soil_type:
+        factor -= 0.1  # holds water longer
+    if "sandy" in soil_type:
+        factor += 0.15  # drains fast
+    if drainage == "poor":
+        factor -= 0.1
+    elif drainage == "good":
+        factor += 0.05
+    return factor
+
+
+def temperature_factor(avg_temp):
+    if avg_temp is None:
+        return 1.0
+    if avg_temp >= 34:
+        return 1.2
+    if avg_temp <= 22:
+        return 0.9
+    return 1.0
+
+
+def crop_stages(crop, crop_cycle=None, phenology=PHENOLOGY_DATA):
+    """{BBCH code: name} of the irrigated stages a crop goes through.
+
+    From the phenology data (e.g. model.phenology_data), else the stages of a given
+    crop_cycle, else every stage with generic names.
+    """
+    crop_lc = (crop or "").lower()
+    for name, data in (phenology or {}).items():
+        if name.lower() == crop_lc:
+            return {code: stage for code, stage in data['stages'].items() if code in IRRIGATION_NEEDS}
+    cycle = (crop_cycle or {}).get('crop_cycle', crop_cycle) or {}
+    growth_stages = cycle.get('growth_stages') or {}
+    stages = growth_stages.values() if isinstance(growth_stages, dict) else growth_stages
+    from_cycle = {s['bbch_code']: s.get('name', STAGE_NAMES[s['bbch_code']])
+                  for s in stages if s.get('bbch_code') in IRRIGATION_NEEDS}
+    return from_cycle or dict(STAGE_NAMES)
+
+
+def stage_response(supplied, demand):
+    """Yield-response proxy of one stage: 0 when dry, 1 at full demand, with diminishing returns"""
+    ratio = np.divide(supplied, demand, out=np.ones_like(supplied, dtype=float), where=demand > 0)
+    return 1 - (1 - np.clip(ratio, 0, 1)) ** 2
+
+
+def yield_proxy(allocation, demand, weights=STAGE_WEIGHTS):
+    """Priority-weighted mean stage response per field (1 = every stage fully supplied)"""
+    weights = np.broadcast_to(weights, np.shape(demand))
+    return (stage_response(allocation, demand) * weights).sum(axis=-1) / weights.sum(axis=-1)
+
+
+def optimize_allocation(demand, budget, weights=STAGE_WEIGHTS, levels=WATER_LEVELS):
+    """Best split of each field's budget over its stages.
+
+    demand: (n_fields x n_stages) mm needed per stage; budget: (n_fields,) seasonal mm;
+    weights: (n_stages,) or per field (n_fields x n_stages), 0 for stages a crop
+    doesn't have. Returns (n_fields x n_stages) allocated mm. Each field's budget
+    (capped at its total demand) is split into `levels` equal units and the DP
+    picks how many units every stage gets.
+    """
+    demand = np.asarray(demand, dtype=float)
+    budget = np.broadcast_to(np.asarray(budget, dtype=float), demand.shape[:1])
+    weights = np.broadcast_to(np.asarray(weights, dtype=float), demand.shape)
+    if len(demand) > CHUNK_FIELDS:
+        return np.concatenate([
+            optimize_allocation(demand[i:i + CHUNK_FIELDS], budget[i:i + CHUNK_FIELDS],
+                                weights[i:i + CHUNK_FIELDS], levels)
+            for i in range(0, len(demand), CHUNK_FIELDS)
+        ])
+    n, n_stages = demand.shape
+    budget = np.minimum(budget, demand.sum(axis=1))
+    unit = budget / levels  # (n,)
+    units = np.arange(levels + 1)
+
+    # gain[s, i, j]: weighted response of stage s on field i when given j units
+    supplied = np.minimum(unit[None, :, None] * units, demand.T[:, :, None])
+    gain = stage_response(supplied, demand.T[:, :, None]) * weights.T[:, :, None]
+
+    # value[i, k]: best total gain of the stages so far using at most k units
+    value = np.zeros((n, levels + 1))
+    choice = np.zeros((n_stages, n, levels + 1), dtype=np.int16)
+    for s in range(n_stages):
+        best = value + gain[s][:, :1]  # j = 0 units for this stage
+        for j in range(1, levels + 1):
+            candidate = value[:, :levels + 1 - j] + gain[s][:, j:j + 1]
+            better = candidate > best[:, j:]  # strict: ties go to the fewest units
+            best[:, j:] = np.where(better, candidate, best[:, j:])
+            choice[s][:, j:][better] = j
+        value = best
+
+    # Walk back from the full budget
+    allocation_units = np.zeros((n, n_stages), dtype=np.int64)
+    left = np.full(n, levels)
+    rows = np.arange(n)
+    for s in range(n_stages - 1, -1, -1):
+        allocation_units[:, s] = choice[s][rows, left]
+        left = left - allocation_units[:, s]
+    return np.minimum(allocation_units * unit[:, None], demand)
+
+
+def _stage_days(crop_cycle, stages=STAGE_NAMES):
+    """Days from sowing at which each stage in STAGE_CODES ends.
+
+    Stages not in `stages` get an empty window, so the crop's own stages cover the season.
+    """
+    cycle = (crop_cycle or {}).get('crop_cycle', crop_cycle) or {}
+    season = cycle.get('season_length_days') or DEFAULT_SEASON_DAYS
+    days = {code: int(season * STAGE_PROPORTIONS[code]) if code in stages else 0 for code in STAGE_CODES}
+    growth_stages = cycle.get('growth_stages') or {}
+    cycle_stages = growth_stages.values() if isinstance(growth_stages, dict) else growth_stages
+    for stage in cycle_stages:
+        if stage.get('bbch_code') in stages and stage.get('days_from_sowing') is not None:
+            days[stage['bbch_code']] = int(stage['days_from_sowing'])
+    return np.maximum.accumulate([days[code] for code in STAGE_CODES])
+
+
+def _forecast_rain(weekly_forecast, sowing_date, stage_end):
+    """Forecast rain (mm) falling inside each stage window"""
+    days = [d for d in weekly_forecast or [] if d.get('date')]
+    rain = np.zeros(len(stage_end))
+    if not days:
+        return rain
+    offsets = (np.array([d['date'] for d in days], dtype='datetime64[D]') - np.datetime64(sowing_date, 'D')).astype(int)
+    mm = np.array([float(d.get('rain') or 0) for d in days])
+    stage = np.searchsorted(stage_end, offsets, side='right')  # first stage ending after that day
+    inside = (offsets >= 0) & (stage < len(stage_end))
+    np.add.at(rain, stage[inside], mm[inside])
+    return rain
+
+
+def plan_fields(fields, default_budget_mm=None, levels=WATER_LEVELS, phenology=PHENOLOGY_DATA):
+    """Budget-constrained stage plans for a list of field dicts.
+
+    Each field has crop_type, sowing_date, water_budget_mm (or the default) and
+    optionally weekly_forecast, soil_profile and crop_cycle (a /predict response or
+    its crop_cycle), in the shape /irrigation accepts. Each crop is planned over its
+    own stages from `phenology` (model.phenology_data); other stages get no water.
+    """
+    n, n_stages = len(fields), len(STAGE_CODES)
+    ends = np.zeros((n, n_stages), dtype=np.int64)
+    weights = np.zeros((n, n_stages))
+    field_stages = []
+    need_per_day = np.zeros(n)
+    rain = np.zeros((n, n_stages))
+    budget = np.zeros(n)
+    sowing = []
+    for i, field in enumerate(fields):
+        field_budget = field.get('water_budget_mm', default_budget_mm)
+        if field_budget is None:
+            raise ValueError(f"Field {i} needs a water_budget_mm")
+        budget[i] = float(field_budget)
+        sowing_date = field.get('sowing_date') or datetime.utcnow().strftime('%Y-%m-%d')
+        sowing_dt = datetime.strptime(sowing_date, '%Y-%m-%d')
+        sowing.append(sowing_dt)
+        stages = crop_stages(field.get('crop_type') or field.get('crop'), field.get('crop_cycle'), phenology)
+        field_stages.append(stages)
+        weights[i] = np.where([code in stages for code in STAGE_CODES], STAGE_WEIGHTS, 0)
+        ends[i] = _stage_days(field.get('crop_cycle'), stages)
+        temps = [float(d['temp']) for d in field.get('weekly_forecast') or [] if d.get('temp') is not None]
+        avg_temp = sum(temps) / len(temps) if temps else None
+        need_per_day[i] = (crop_base_mm(field.get('crop_type') or field.get('crop')) / 14
+                           * soil_factor(field.get('soil_profile')) * temperature_factor(avg_temp))
+        rain[i] = _forecast_rain(field.get('weekly_forecast'), sowing_date, ends[i])
+    if (budget < 0).any():
+        raise ValueError("water_budget_mm must be non-negative")
+
+    starts = np.concatenate([np.zeros((n, 1), dtype=np.int64), ends[:, :-1]], axis=1)
+    demand = np.maximum(0, (ends - starts) * need_per_day[:, None] * STAGE_AMOUNTS - EFFECTIVE_RAIN * rain)
+    demand[weights == 0] = 0
+    allocation = optimize_allocation(demand, budget, weights, levels)
+
+    # Baseline: the same budget spread evenly over the season's days
+    season_days = np.maximum(ends[:, -1], 1)
+    even = np.minimum(demand, budget[:, None] * (ends - starts) / season_days[:, None])
+    optimized_score, even_score = yield_proxy(allocation, demand, weights), yield_proxy(even, demand, weights)
+
+    plans = []
+    for i, field in enumerate(fields):
+        stages = []
+        for s, code in enumerate(STAGE_CODES):
+            if code not in field_stages[i]:
+                continue
+            needs = IRRIGATION_NEEDS[code]
+            stages.append({
+                'growth_stage': field_stages[i][code],
+                'bbch_code': code,
+                'start_date': (sowing[i] + timedelta(days=int(starts[i, s]))).strftime('%Y-%m-%d'),
+                'end_date': (sowing[i] + timedelta(days=int(ends[i, s]))).strftime('%Y-%m-%d'),
+                'priority': needs['priority'],
+                'irrigation_frequency': needs['frequency'],
+                'demand_mm': round(float(demand[i, s]), 1),
+                'allocated_mm': round(float(allocation[i, s]), 1),
+            })
+        plans.append({
+            'field_id': field.get('field_id', i),
+            'crop_type': field.get('crop_type') or field.get('crop'),
+            'water_budget_mm': round(float(budget[i]), 1),
+            'total_demand_mm': round(float(demand[i].sum()), 1),
+            'allocated_mm': round(float(allocation[i].sum()), 1),
+            'yield_proxy': round(float(optimized_score[i]), 4),
+            'even_split_yield_proxy': round(float(even_score[i]), 4),
+            'stages': stages,
+        })
+    return plans
@@ -0,0 +1,246 @@
+# Load-test harness for the Flask APIs, replaying realistic payload mixes
+# Drives an app in-process (Flask test client) or a running server over HTTP with
+# /predict payloads sampled from large_agri_dataset.csv and /irrigation payloads
+# with synthetic weekly forecasts; reports throughput, latency percentiles and errors.
+#
+# Usage:
+#   python load_test.py --concurrency 16 --duration 10 --mix predict=0.7,predict_batch=0.1,irrigation=0.2
+#   python load_test.py --url http://127.0.0.1:5000 --concurrency 32
+#   python load_test.py --compare "" "AGRI_COALESCE_WINDOW_MS=3" "accept=application/msgpack"
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ====== CONFIG ======
+DATASET = 'large_agri_dataset.csv'
+DEFAULT_MIX = 'predict=0.8,irrigation=0.2'
+BATCH_SIZE = 50
+PAYLOAD_POOL = 1000
+SOIL_PROFILES = [
+    {"type": "loam", "drainage": "moderate"},
+    {"type": "clay", "drainage": "poor"},
+    {"type": "sandy loam", "drainage": "good"},
+    {"type": "black cotton", "drainage": "moderate"},
+]
+ENDPOINTS = {'predict': '/predict', 'predict_batch': '/predict/batch', 'irrigation': '/irrigation'}
+
+
+def _weekly_forecast(rng, avg_temp, sowing_date):
+    """Seven synthetic days around the record's temperature; wetter in the monsoon months"""
+    monsoon = pd.Timestamp(sowing_date).month in (6, 7, 8, 9)
+    rain_chance, rain_mean = (0.6, 12.0) if monsoon else (0.15, 4.0)
+    start = pd.Timestamp(sowing_date)
+    return [
+        {
+            "date": (start + pd.Timedelta(days=d)).strftime('%Y-%m-%d'),
+            "temp": round(float(avg_temp + rng.normal(0, 2)), 1),
+            "rain": round(float(rng.exponential(rain_mean)) if rng.random() < rain_chance else 0.0, 1),
+            "humidity": int(rng.integers(40, 95)),
+        }
+        for d in range(7)
+    ]
+
+
+def build_payloads(dataset=DATASET, n=PAYLOAD_POOL, seed=0):
+    """Payload pools per endpoint, sampled from the dataset"""
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(dataset, usecols=['Crop_Type', 'Sowing_Date', 'Avg_Temp', 'Tmax', 'Tmin'])
+    df = df.sample(n=min(n, len(df)), random_state=seed)
+    records = [
+        {'crop_type': r.Crop_Type, 'avg_temp': r.Avg_Temp, 'tmax': r.Tmax, 'tmin': r.Tmin, 'sowing_date': r.Sowing_Date}
+        for r in df.itertuples()
+    ]
+    batches = [
+        {'records': [records[j % len(records)] for j in range(i, i + BATCH_SIZE)]}
+        for i in range(0, len(records), BATCH_SIZE)
+    ]
+    irrigation = [
+        {
+            'crop_type': r['crop_type'],
+            'sowing_date': r['sowing_date'],
+            'weekly_forecast': _weekly_forecast(rng, r['avg_temp'], r['sowing_date']),
+            'crop_cycle': {},
+            'soil_profile': SOIL_PROFILES[int(rng.integers(len(SOIL_PROFILES)))],
+        }
+        for r in records
+    ]
+    return {'predict': records, 'predict_batch': batches, 'irrigation': irrigation}
+
+
+def parse_mix(mix):
+    """'predict=0.8,irrigation=0.2' -> (names, normalised weights)"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' in mix. Choose from: {', '.join(ENDPOINTS)}")
+        weights[name.strip()] = float(weight or 1)
+    names = list(weights)
+    total = sum(weights.values())
+    return names, np.array([weights[n] / total for n in names])
+
+
+class InProcessClient:
+    """Flask test client for an app module (waits for background startup if it has one)"""
+
+    def __init__(self, module_name):
+        module = importlib.import_module(module_name)
+        if hasattr(module, 'startup_done'):
+            module.startup_done.wait()
+        self.app = module.app
+        self._local = threading.local()
+
+    def post(self, path, payload, headers):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client()
+        response = self._local.client.post(path, json=payload, headers=headers)
+        return response.status_code
+
+
+class HttpClient:
+    """requests session per worker thread against a running server"""
+
+    def __init__(self, base_url, timeout=30):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def post(self, path, payload, headers):
+        if not hasattr(self._local, 'session'):
+            self._local.session = self._requests.Session()
+        response = self._local.session.post(self.base_url + path, json=payload, headers=headers, timeout=self.timeout)
+        return response.status_code
+
+
+def run_load(client, payloads, mix=DEFAULT_MIX, concurrency=8, duration_s=10.0, warmup=10, accept=None, seed=0):
+    """Closed-loop load for `duration_s`; returns per-endpoint and overall stats"""
+    names, weights = parse_mix(mix)
+    headers = {'Accept': accept} if accept else {}
+
+    for i in range(warmup):
+        name = names[i % len(names)]
+        client.post(ENDPOINTS[name], payloads[name][i % len(payloads[name])], headers)
+
+    stop_at = time.perf_counter() + duration_s
+
+    def worker(worker_id):
+        rng = np.random.default_rng(seed + worker_id)
+        samples = []  # (endpoint, latency_ms, ok)
+        i = worker_id
+        while time.perf_counter() < stop_at:
+            name = names[rng.choice(len(names), p=weights)]
+            pool = payloads[name]
+            start = time.perf_counter()
+            try:
+                ok = 200 <= client.post(ENDPOINTS[name], pool[i % len(pool)], headers) < 300
+            except Exception:
+                ok = False
+            samples.append((name, (time.perf_counter() - start) * 1000, ok))
+            i += concurrency
+        return samples
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = [s for worker_samples in pool.map(worker, range(concurrency)) for s in worker_samples]
+
+    frame = pd.DataFrame(samples, columns=['endpoint', 'latency_ms', 'ok'])
+    groups = [('all', frame)] + list(frame.groupby('endpoint'))
+    return {name: summarize(group, duration_s) for name, group in groups}
+
+
+def summarize(frame, duration_s):
+    latencies = frame['latency_ms'].to_numpy()
+    if not len(latencies):
+        return {'requests': 0}
+    return {
+        'requests': int(len(latencies)),
+        'throughput_rps': round(len(latencies) / duration_s, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'error_rate': round(float(1 - frame['ok'].mean()), 4),
+    }
+
+
+def parse_mode(spec):
+    """'AGRI_COALESCE_WINDOW_MS=3,accept=application/msgpack' -> (env overrides, accept, url)"""
+    env, accept, url = {}, None, None
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        key, _, value = part.partition('=')
+        if key.lower() == 'accept':
+            accept = value
+        elif key.lower() == 'url':
+            url = value
+        else:
+            env[key] = value
+    return env, accept, url
+
+
+def compare_modes(specs, args):
+    """Run each serving mode in its own process (apps read their config at import) and tabulate"""
+    rows = []
+    for spec in specs:
+        env, accept, url = parse_mode(spec)
+        cmd = [sys.executable, os.path.abspath(__file__), '--json',
+               '--app', args.app, '--dataset', args.dataset, '--mix', args.mix,
+               '--concurrency', str(args.concurrency), '--duration', str(args.duration),
+               '--warmup', str(args.warmup)]
+        if accept:
+            cmd += ['--accept', accept]
+        if url or args.url:
+            cmd += ['--url', url or args.url]
+        result = subprocess.run(cmd, env={**os.environ, **env}, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ Mode '{spec}' failed:\n{result.stderr[-2000:]}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        for endpoint, s in stats.items():
+            rows.append({'mode': spec or 'baseline', 'endpoint': endpoint, **s})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay realistic /predict and /irrigation load")
+    parser.add_argument('--app', default='app', help="Flask app module for in-process runs")
+    parser.add_argument('--url', help="Base URL of a running server (default: in-process)")
+    parser.add_argument('--dataset', default=DATASET)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Endpoint weights, e.g. predict=0.8,irrigation=0.2")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of load per run")
+    parser.add_argument('--warmup', type=int, default=10, help="Requests sent before measuring")
+    parser.add_argument('--accept', help="Accept header for every request")
+    parser.add_argument('--compare', nargs='+', metavar='MODE',
+                        help="Serving modes to run side by side, e.g. '' 'AGRI_COALESCE_WINDOW_MS=3'")
+    parser.add_argument('--json', action='store_true', help="Print the stats as one JSON line")
+    args = parser.parse_args()
+
+    if args.compare:
+        table = compare_modes(args.compare, args)
+        print("\n" + "="*60)
+        print(f"📊 LOAD TEST COMPARISON (concurrency {args.concurrency}, {args.duration:g}s per mode, mix {args.mix})")
+        print("="*60)
+        print(table.to_string(index=False))
+        sys.exit(0)
+
+    payloads = build_payloads(args.dataset)
+    client = HttpClient(args.url) if args.url else InProcessClient(args.app)
+    stats = run_load(client, payloads, args.mix, args.concurrency, args.duration, args.warmup, args.accept)
+
+    if args.json:
+        print(json.dumps(stats))
+    else:
+        print("\n" + "="*60)
+        print(f"📊 LOAD TEST (concurrency {args.concurrency}, {args.duration:g}s, mix {args.mix})")
+        print("="*60)
+        print(pd.DataFrame(stats).T.to_string())
@@ -0,0 +1,155 @@
+# Memory accounting for trained models and the serving process
+# Reports node counts and in-memory bytes per estimator, process RSS and, when
+# enabled with AGRI_TRACEMALLOC=1, peak Python allocations per Flask endpoint.
+
+import os
+import pickle
+import sys
+import threading
+import time
+import tracemalloc
+
+
+def _mb(n_bytes):
+    return round(n_bytes / 1024 / 1024, 3)
+
+
+def estimator_memory(estimator):
+    """Trees, nodes and bytes held by one fitted estimator"""
+    if hasattr(estimator, 'node_count') and hasattr(estimator, 'nbytes'):
+        # CompactForest: flat node arrays
+        trees, nodes, n_bytes = estimator.n_trees, estimator.node_count, estimator.nbytes
+    elif hasattr(estimator, 'estimators_'):
+        # sklearn forest: each tree keeps a node struct array plus a value array
+        trees, nodes, n_bytes = len(estimator.estimators_), 0, 0
+        for tree in estimator.estimators_:
+            state = tree.tree_.__getstate__()
+            nodes += state['node_count']
+            n_bytes += state['nodes'].nbytes + state['values'].nbytes
+    elif hasattr(estimator, '_predictors'):
+        # HistGradientBoosting: one TreePredictor per iteration
+        predictors = [p for iteration in estimator._predictors for p in iteration]
+        trees = len(predictors)
+        nodes = sum(len(p.nodes) for p in predictors)
+        n_bytes = sum(p.nodes.nbytes for p in predictors)
+    else:
+        trees, nodes, n_bytes = None, None, len(pickle.dumps(estimator))
+
+    return {
+        'type': type(estimator).__name__,
+        'trees': trees,
+        'nodes': nodes,
+        'bytes': n_bytes,
+        'mb': _mb(n_bytes),
+    }
+
+
+def model_memory(model):
+    """Per-estimator memory of an EnhancedCropCyclePredictionModel, plus the total"""
+    estimators = {'yield_model': estimator_memory(model.yield_model)}
+    for name, interval_model in (model.yield_interval_models or {}).items():
+        estimators[f'yield_interval_{name}'] = estimator_memory(interval_model)
+    for target, cycle_model in model.cycle_models.items():
+        estimators[f'cycle_models.{target}'] = estimator_memory(cycle_model)
+    if getattr(model, 'yield_quantiles', None) is not None:
+        sketch = model.yield_quantiles.sketch
+        estimators['yield_quantiles'] = {
+            'type': 'QuantileForestSketch', 'trees': None, 'nodes': len(sketch),
+            'bytes': sketch.nbytes, 'mb': _mb(sketch.nbytes),
+        }
+
+    total = sum(e['bytes'] for e in estimators.values())
+    return {'estimators': estimators, 'total_bytes': total, 'total_mb': _mb(total)}
+
+
+def process_rss_bytes():
+    """Current resident set size (Linux /proc), else the peak reported by getrusage; None when neither exists"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def print_memory_summary(model):
+    """Training-log summary: one line per estimator plus the total and RSS"""
+    report = model_memory(model)
+    print("🧠 Model memory:")
+    for name, e in report['estimators'].items():
+        shape = f"{e['trees']} trees, {e['nodes']} nodes" if e['trees'] is not None else f"{e['nodes']} rows"
+        print(f"   {name:<45} {e['mb']:>8.2f} MB  ({shape})")
+    rss = process_rss_bytes()
+    rss_text = f"{_mb(rss):.1f} MB" if rss is not None else "n/a"
+    print(f"   {'total':<45} {report['total_mb']:>8.2f} MB   process RSS: {rss_text}")
+    return report
+
+
+class EndpointMemoryTracker:
+    """Peak Python allocations per Flask endpoint, measured with tracemalloc.
+
+    tracemalloc's peak is process-wide, so concurrent requests inflate each
+    other's numbers; measurements are serialised per request with a lock.
+    Tracing itself slows allocation-heavy code, so keep it off in production.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.endpoints = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        app.before_request(self._before)
+        app.teardown_request(self._after)
+
+    def _before(self):
+        self._lock.acquire()
+        self._local.active = True
+        tracemalloc.reset_peak()
+        self._local.start_bytes = tracemalloc.get_traced_memory()[0]
+        self._local.start_time = time.perf_counter()
+
+    def _after(self, exc=None):
+        if not getattr(self._local, 'active', False):
+            return
+        from flask import request
+        try:
+            current, peak = tracemalloc.get_traced_memory()
+            peak_bytes = max(0, peak - self._local.start_bytes)
+            stats = self.endpoints.setdefault(request.endpoint or request.path, {
+                'requests': 0, 'last_peak_bytes': 0, 'max_peak_bytes': 0, 'total_peak_bytes': 0,
+            })
+            stats['requests'] += 1
+            stats['last_peak_bytes'] = peak_bytes
+            stats['max_peak_bytes'] = max(stats['max_peak_bytes'], peak_bytes)
+            stats['total_peak_bytes'] += peak_bytes
+            stats['last_retained_bytes'] = current - self._local.start_bytes
+            stats['last_duration_ms'] = round((time.perf_counter() - self._local.start_time) * 1000, 2)
+        finally:
+            self._local.active = False
+            self._lock.release()
+
+    def stats(self):
+        return {
+            endpoint: {
+                **s,
+                'mean_peak_bytes': s['total_peak_bytes'] // s['requests'],
+                'max_peak_mb': _mb(s['max_peak_bytes']),
+            }
+            for endpoint, s in self.endpoints.items()
+        }
+
+
+def tracemalloc_enabled():
+    return os.environ.get('AGRI_TRACEMALLOC', '0').lower() in ('1', 'true', 'yes')
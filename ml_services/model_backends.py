@@ -0,0 +1,89 @@
+# Model backends for EnhancedCropCyclePredictionModel
+# A backend decides which estimator is fitted for the yield and phenology targets
+# and how the yield confidence interval is produced.
+
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.inspection import permutation_importance
+
+# Default forest sizes; incremental updates keep forests at or below these caps
+YIELD_TREES = 100
+CYCLE_TREES = 80
+
+# Yield confidence interval bounds (percent)
+CI_LOWER_PCT = 5
+CI_UPPER_PCT = 95
+
+# Forest CI modes: pooled per-leaf training-target quantiles (quantile regression
+# forest), or percentiles of the per-tree predictions
+QUANTILE_FOREST = 'quantile_forest'
+TREE_PERCENTILE = 'tree_percentile'
+INTERVAL_MODES = (QUANTILE_FOREST, TREE_PERCENTILE)
+
+
+class RandomForestBackend:
+    """Bagged trees; the CI comes from the forest itself (see INTERVAL_MODES)"""
+    name = 'random_forest'
+    supports_incremental = True
+
+    def make_yield_model(self):
+        return RandomForestRegressor(n_estimators=YIELD_TREES, random_state=42, max_depth=15)
+
+    def make_cycle_model(self):
+        return RandomForestRegressor(n_estimators=CYCLE_TREES, random_state=42, max_depth=12)
+
+    def make_interval_models(self):
+        return None
+
+    def feature_importances(self, model, X_test, y_test):
+        return np.asarray(model.feature_importances_)
+
+
+class HistGradientBoostingBackend:
+    """Histogram gradient boosting; the CI comes from two quantile-loss models.
+
+    Much smaller artifact and faster inference than the forests. Early stopping
+    is disabled so repeated runs on the same data give the same model.
+    """
+    name = 'hist_gradient_boosting'
+    supports_incremental = False
+
+    def __init__(self, max_iter=200, learning_rate=0.1, max_leaf_nodes=31):
+        self.params = {
+            'max_iter': max_iter,
+            'learning_rate': learning_rate,
+            'max_leaf_nodes': max_leaf_nodes,
+            'early_stopping': False,
+            'random_state': 42,
+        }
+
+    def make_yield_model(self):
+        return HistGradientBoostingRegressor(**self.params)
+
+    def make_cycle_model(self):
+        return HistGradientBoostingRegressor(**self.params)
+
+    def make_interval_models(self):
+        return {
+            'lower': HistGradientBoostingRegressor(loss='quantile', quantile=CI_LOWER_PCT / 100, **self.params),
+            'upper': HistGradientBoostingRegressor(loss='quantile', quantile=CI_UPPER_PCT / 100, **self.params),
+        }
+
+    def feature_importances(self, model, X_test, y_test):
+        # Boosted models have no impurity importances; use permutation importance instead
+        result = permutation_importance(model, X_test, y_test, n_repeats=5, random_state=42)
+        importances = np.clip(result.importances_mean, 0, None)
+        total = importances.sum()
+        return importances / total if total > 0 else importances
+
+
+BACKENDS = {
+    RandomForestBackend.name: RandomForestBackend,
+    HistGradientBoostingBackend.name: HistGradientBoostingBackend,
+}
+
+
+def get_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
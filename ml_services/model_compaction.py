@@ -0,0 +1,310 @@
+# Post-training compaction of random-forest models
+# Converts fitted forests into flat float32 node arrays, merges leaf pairs that
+# predict the same value, and can cap depth / tree count to hit a target size.
+# Usage: python model_compaction.py --model agri_forecasting_model.pkl --target-mb 5
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+
+from integrated_crop_prediction_training import SPLIT_SEED, TEST_SIZE, EnhancedCropCyclePredictionModel
+from memory_profile import print_memory_summary
+from model_backends import RandomForestBackend
+
+MIN_DEPTH = 6
+MIN_TREES = 10
+
+
+def _float32_floor(values):
+    """Largest float32 <= each value, so `x32 <= t32` matches sklearn's `x32 <= t64` exactly"""
+    t32 = values.astype(np.float32)
+    too_high = t32.astype(np.float64) > values
+    t32[too_high] = np.nextafter(t32[too_high], np.float32(-np.inf))
+    return t32
+
+
+class CompactForest:
+    """A forest stored as flat node arrays shared by all trees.
+
+    Drop-in for the `predict` of a fitted RandomForestRegressor. Internal nodes keep
+    feature/threshold/children; leaves have left == -1 and carry the prediction.
+    """
+
+    def __init__(self, roots, left, right, feature, threshold, value, n_features_in):
+        self.roots = roots
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.n_features_in_ = n_features_in
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.left)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.roots, self.left, self.right, self.feature, self.threshold, self.value))
+
+    def truncate(self, n_trees):
+        """Keep the first `n_trees` trees (trees of a random forest are exchangeable)"""
+        if n_trees >= self.n_trees:
+            return self
+        end = self.roots[n_trees]
+        return CompactForest(self.roots[:n_trees], self.left[:end], self.right[:end],
+                             self.feature[:end], self.threshold[:end], self.value[:end], self.n_features_in_)
+
+    def apply(self, X):
+        """Leaf index of every (sample, tree); shape (n_samples, n_trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        while True:
+            internal = self.left[node] >= 0
+            if not internal.any():
+                return node
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(internal, np.where(go_left, self.left[node], self.right[node]), node)
+
+    def contributions(self, X):
+        """Path decomposition: (bias, per-feature contributions shaped (n_samples, n_features))"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        contrib = np.zeros((len(X), self.n_features_in_))
+        while True:
+            internal = self.left[node] >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            child = np.where(internal, np.where(go_left, self.left[node], self.right[node]), node)
+            delta = self.value[child].astype(np.float64) - self.value[node]
+            np.add.at(contrib, (np.broadcast_to(rows, node.shape), self.feature[node]), delta)
+            node = child
+        return float(self.value[self.roots].mean()), contrib / self.n_trees
+
+    def predict_trees(self, X):
+        """Per-tree predictions; shape (n_trees, n_samples)"""
+        return self.value[self.apply(X)].T.astype(np.float64)
+
+    def predict(self, X):
+        return self.predict_trees(X).mean(axis=0)
+
+
+def compact_forest(forest, max_depth=None, tolerance=0.0):
+    """Build a CompactForest from a fitted RandomForestRegressor"""
+    return _compact_forest(forest, max_depth, tolerance)[0]
+
+
+def _compact_forest(forest, max_depth, tolerance):
+    """CompactForest plus, per compact node, the original node it was built from
+    (numbered across all trees, as QuantileForestSketch does)"""
+    roots, left, right, feature, threshold, value, source = [], [], [], [], [], [], []
+    src_offset = 0
+
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        node_values = tree.value[:, 0, 0]
+        node_thresholds = _float32_floor(tree.threshold)
+        base = len(left)
+        roots.append(base)
+
+        def emit(src, depth):
+            """Append `src` (and its kept subtree); returns its compact index"""
+            idx = len(left)
+            left.append(-1); right.append(-1); feature.append(0)
+            threshold.append(np.float32(0)); value.append(np.float32(node_values[src]))
+            source.append(src_offset + src)
+
+            is_leaf = tree.children_left[src] == -1
+            if is_leaf or (max_depth is not None and depth >= max_depth):
+                return idx
+
+            l_idx = emit(tree.children_left[src], depth + 1)
+            r_idx = emit(tree.children_right[src], depth + 1)
+            both_leaves = left[l_idx] == -1 and left[r_idx] == -1
+            if both_leaves and abs(float(value[l_idx]) - float(value[r_idx])) <= tolerance:
+                # Redundant split: both children predict (nearly) the same value
+                del left[l_idx:], right[l_idx:], feature[l_idx:], threshold[l_idx:], value[l_idx:], source[l_idx:]
+                return idx
+
+            left[idx], right[idx] = l_idx, r_idx
+            feature[idx], threshold[idx] = tree.feature[src], node_thresholds[src]
+            return idx
+
+        emit(0, 0)
+        src_offset += tree.node_count
+
+    feature_dtype = np.int8 if forest.n_features_in_ < 128 else np.int16
+    compact = CompactForest(
+        np.asarray(roots, dtype=np.int32),
+        np.asarray(left, dtype=np.int32),
+        np.asarray(right, dtype=np.int32),
+        np.asarray(feature, dtype=feature_dtype),
+        np.asarray(threshold, dtype=np.float32),
+        np.asarray(value, dtype=np.float32),
+        forest.n_features_in_,
+    )
+    return compact, np.asarray(source, dtype=np.int64)
+
+
+def _with_forests(model, yield_forest, yield_source, cycle_forests, settings):
+    compact = EnhancedCropCyclePredictionModel(backend=model.backend, interval_mode=model.interval_mode)
+    compact.__dict__.update(model.__dict__)
+    compact.yield_model = yield_forest
+    compact.cycle_models = cycle_forests
+    compact.compaction = settings
+    if model.yield_quantiles is not None:
+        # A pruned or merged node keeps the sketch of every training target below it
+        compact.yield_quantiles = model.yield_quantiles.remap(yield_source[:yield_forest.node_count])
+    return compact
+
+
+def _artifact_size(model):
+    size = sum(f.nbytes for f in [model.yield_model, *model.cycle_models.values()])
+    if model.yield_quantiles is not None:
+        size += model.yield_quantiles.sketch.nbytes
+    return size
+
+
+def compact_model(model, max_depth=None, max_trees=None, tolerance=0.0, target_size_mb=None):
+    """Compacted copy of a random-forest EnhancedCropCyclePredictionModel.
+
+    With `target_size_mb`, depth and tree count are lowered alternately (never
+    below MIN_DEPTH / MIN_TREES) until the forests' node arrays fit the target.
+    """
+    if model.backend != RandomForestBackend.name or model.compaction:
+        raise ValueError("Compaction needs an uncompacted random_forest model")
+
+    compacted_by_depth = {}
+    depth, trees, step = max_depth, max_trees or len(model.yield_model.estimators_), 0
+    while True:
+        if depth not in compacted_by_depth:
+            compacted_by_depth[depth] = (
+                *_compact_forest(model.yield_model, depth, tolerance),
+                {t: compact_forest(m, depth, tolerance) for t, m in model.cycle_models.items()},
+            )
+        yield_forest, yield_source, cycle_forests = compacted_by_depth[depth]
+
+        scale = trees / yield_forest.n_trees
+        candidate = _with_forests(
+            model,
+            yield_forest.truncate(trees),
+            yield_source,
+            {t: f.truncate(max(1, int(round(f.n_trees * scale)))) for t, f in cycle_forests.items()},
+            {'max_depth': depth, 'max_trees': trees, 'tolerance': tolerance},
+        )
+        size_mb = _artifact_size(candidate) / 1024 / 1024
+        if target_size_mb is None or size_mb <= target_size_mb:
+            return candidate
+
+        current_depth = depth or max(e.get_depth() for e in model.yield_model.estimators_)
+        can_cut_depth, can_cut_trees = current_depth > MIN_DEPTH, trees > MIN_TREES
+        if not (can_cut_depth or can_cut_trees):
+            print(f"⚠️  Could not reach {target_size_mb} MB; smallest model is {size_mb:.2f} MB")
+            return candidate
+        if can_cut_depth and (step % 2 == 0 or not can_cut_trees):
+            depth = current_depth - 1
+        else:
+            trees = max(MIN_TREES, int(trees * 0.8))
+        step += 1
+
+
+def held_out_split(model, df):
+    """Reproduce the TEST_SIZE / SPLIT_SEED holdout train_models evaluated on"""
+    X = model._align_features(model.prepare_features(df))
+    _, X_test, _, idx_test = train_test_split(X, df.index, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+    return X_test, df.loc[idx_test]
+
+
+def compaction_report(original, compacted, df, n_requests=200):
+    """Size, load time, latency and held-out accuracy of both models"""
+    X_test, df_test = held_out_split(original, df)
+    requests = df_test.head(n_requests)
+    report = {}
+
+    for name, model in (('original', original), ('compacted', compacted)):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.pkl')
+            model.save_model(path)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            start = time.perf_counter()
+            with open(path, 'rb') as f:
+                pickle.load(f)
+            load_s = time.perf_counter() - start
+
+        latencies = []
+        for row in requests.itertuples():
+            start = time.perf_counter()
+            model.predict_with_current_date(row.Crop_Type, row.Avg_Temp, row.Tmax, row.Tmin, row.Sowing_Date)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        accuracy = {}
+        targets = {'yield': (model.yield_model, 'Actual_Yield'), **{t: (m, t) for t, m in model.cycle_models.items()}}
+        for target, (estimator, column) in targets.items():
+            y_pred = estimator.predict(X_test)
+            accuracy[target] = {
+                'r2': r2_score(df_test[column], y_pred),
+                'rmse': float(np.sqrt(mean_squared_error(df_test[column], y_pred))),
+            }
+
+        report[name] = {
+            'size_mb': round(size_mb, 3),
+            'load_s': round(load_s, 4),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+            'accuracy': accuracy,
+        }
+
+    report['accuracy_loss'] = {
+        target: {
+            'r2': report['original']['accuracy'][target]['r2'] - report['compacted']['accuracy'][target]['r2'],
+            'rmse': report['compacted']['accuracy'][target]['rmse'] - report['original']['accuracy'][target]['rmse'],
+        }
+        for target in report['original']['accuracy']
+    }
+    report['settings'] = compacted.compaction
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact a trained agri forecasting model")
+    parser.add_argument('--model', default='agri_forecasting_model.pkl')
+    parser.add_argument('--dataset', default='large_agri_dataset.csv')
+    parser.add_argument('--out', default='agri_forecasting_model_compact.pkl')
+    parser.add_argument('--max-depth', type=int)
+    parser.add_argument('--max-trees', type=int)
+    parser.add_argument('--tolerance', type=float, default=0.0, help="Merge sibling leaves closer than this")
+    parser.add_argument('--target-mb', type=float, help="Shrink depth/trees until the forests fit this size")
+    args = parser.parse_args()
+
+    original = EnhancedCropCyclePredictionModel.load_model(args.model)
+    if original is None:
+        raise SystemExit(f"Could not load {args.model}")
+    compacted = compact_model(original, args.max_depth, args.max_trees, args.tolerance, args.target_mb)
+    compacted.save_model(args.out)
+    print_memory_summary(compacted)
+
+    report = compaction_report(original, compacted, pd.read_csv(args.dataset))
+    print("\n" + "="*60)
+    print("🗜️  COMPACTION REPORT")
+    print("="*60)
+    print(f"Settings: {report['settings']}")
+    for key in ('size_mb', 'load_s', 'p50_ms', 'p99_ms'):
+        print(f"{key:>10}: {report['original'][key]:>10} -> {report['compacted'][key]}")
+    print("\nHeld-out accuracy (R² / RMSE, original -> compacted):")
+    for target, loss in report['accuracy_loss'].items():
+        o, c = report['original']['accuracy'][target], report['compacted']['accuracy'][target]
+        print(f"  {target:<32} R² {o['r2']:.4f} -> {c['r2']:.4f}   RMSE {o['rmse']:.3f} -> {c['rmse']:.3f}")
@@ -0,0 +1,96 @@
+# Quantile regression forest intervals from per-node target sketches
+# At training time every node of every tree stores a small, evenly spaced set
+# of quantiles of the training targets that reach it. At query time the sketches
+# of the leaves a record lands in are pooled (equal weight per tree, as in
+# Meinshausen's quantile regression forests) and any quantile is read off them.
+
+import numpy as np
+
+SKETCH_SIZE = 11  # quantile points kept per node (0%, 10%, ..., 100%)
+
+
+class QuantileForestSketch:
+    """Per-node quantile sketches aligned with a forest's node numbering.
+
+    `tree_offsets[t]` is where tree t's nodes start in `sketch`; it is None when the
+    forest's `apply` already returns global node ids (CompactForest).
+    """
+
+    def __init__(self, sketch, tree_offsets=None):
+        self.sketch = sketch
+        self.tree_offsets = tree_offsets
+
+    @classmethod
+    def fit(cls, estimators, X, y, sketch_size=SKETCH_SIZE):
+        """Sketch the targets reaching every node of `estimators` (fitted decision trees).
+
+        Built one tree at a time, so peak memory is one tree's (rows x depth) entries.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y, dtype=np.float64)
+        sketches = [_tree_sketch(est, X, y, sketch_size) for est in estimators]
+        offsets = np.concatenate([[0], np.cumsum([len(s) for s in sketches])]).astype(np.int64)
+        return cls(np.concatenate(sketches), offsets)
+
+    @property
+    def n_trees(self):
+        return len(self.tree_offsets) - 1
+
+    def keep_last_trees(self, n):
+        """Sketch restricted to the last `n` trees"""
+        start = self.tree_offsets[-n - 1] if n else self.tree_offsets[-1]
+        return QuantileForestSketch(self.sketch[start:], self.tree_offsets[-n - 1:] - start)
+
+    def append(self, other):
+        offsets = np.concatenate([self.tree_offsets, other.tree_offsets[1:] + self.tree_offsets[-1]])
+        return QuantileForestSketch(np.concatenate([self.sketch, other.sketch]), offsets)
+
+    def remap(self, source_nodes):
+        """Sketch indexed by a compacted forest's node ids (`source_nodes` = original global ids)"""
+        return QuantileForestSketch(self.sketch[source_nodes], None)
+
+    def quantiles(self, forest, X, qs):
+        """Quantiles `qs` (0..1) for every row of X; shape (len(qs), n_samples)"""
+        node_ids = forest.apply(X)
+        if self.tree_offsets is not None:
+            node_ids = node_ids + self.tree_offsets[:-1][None, :]
+        pooled = self.sketch[node_ids].reshape(len(node_ids), -1)
+        # Only nodes no training row reached are NaN; nanquantile is several times slower
+        quantile = np.nanquantile if np.isnan(pooled).any() else np.quantile
+        return quantile(pooled, qs, axis=1)
+
+
+def _tree_sketch(estimator, X, y, sketch_size):
+    """(n_nodes x sketch_size) quantiles of the targets reaching each node of one tree"""
+    tree = estimator.tree_
+    parent = np.full(tree.node_count, -1, dtype=np.int64)
+    internal = np.flatnonzero(tree.children_left >= 0)
+    parent[tree.children_left[internal]] = internal
+    parent[tree.children_right[internal]] = internal
+
+    # Walk every sample from its leaf up to the root: one (node, target) entry per level
+    node = estimator.apply(X).astype(np.int64)
+    sample = np.arange(len(y))
+    node_of_entry, y_entry = [], []
+    while len(node):
+        node_of_entry.append(node)
+        y_entry.append(y[sample])
+        up = parent[node]
+        keep = up >= 0
+        node, sample = up[keep], sample[keep]
+    node_of_entry = np.concatenate(node_of_entry)
+    y_entry = np.concatenate(y_entry)
+    y_sorted = y_entry[np.lexsort((y_entry, node_of_entry))]
+
+    # Linear interpolation at evenly spaced ranks inside each node's sorted targets
+    counts = np.bincount(node_of_entry, minlength=tree.node_count)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    pos = starts[:, None] + np.linspace(0, 1, sketch_size)[None, :] * np.maximum(counts - 1, 0)[:, None]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    frac = pos - lo
+    empty = counts == 0
+    lo[empty], hi[empty] = 0, 0
+    sketch = y_sorted[lo] * (1 - frac) + y_sorted[hi] * frac
+    sketch[empty] = np.nan
+    return sketch.astype(np.float32)
@@ -0,0 +1,163 @@
+# Micro-batching for concurrent single-record predictions
+# Requests arriving within a short window (or until the batch is full) are scored
+# together with one predict_batch call, and each caller gets its own result back.
+# Usage: python request_coalescer.py [model.pkl] [dataset.csv]  (local load comparison)
+
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+# ====== CONFIG ======
+DEFAULT_WINDOW_MS = 3
+DEFAULT_MAX_BATCH = 64
+RECORD_BUDGET_MS = 50  # scoring time allowed per record of a full batch before a caller gives up
+
+
+class RequestCoalescer:
+    """Collects records from concurrent callers and scores them as one matrix.
+
+    `predict_batch(records, explain)` must return one result per record, in order.
+    The window starts when the first record of a batch arrives, so an idle
+    server adds at most `window_ms` to a lone request. A caller waits at most
+    `timeout_ms` (default: the window plus RECORD_BUDGET_MS per record of a full batch).
+    """
+
+    def __init__(self, predict_batch, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH, timeout_ms=None):
+        self.predict_batch = predict_batch
+        self.window_s = window_ms / 1000
+        self.max_batch = max_batch
+        self.timeout_s = (timeout_ms or window_ms + max_batch * RECORD_BUDGET_MS) / 1000
+        self.batches = 0
+        self.records = 0
+        self._pending = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name='request-coalescer', daemon=True)
+        self._worker.start()
+
+    def submit(self, record, explain=False):
+        """Queue one record and block until its batch has been scored.
+
+        Raises TimeoutError when no result arrives within `timeout_s`; a record whose
+        batch has not started yet is then dropped from the queue.
+        """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("RequestCoalescer is closed")
+            self._pending.append((record, explain, future))
+            self._cond.notify()
+        try:
+            return future.result(timeout=self.timeout_s)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Prediction not scored within {self.timeout_s * 1000:.0f} ms")
+
+    def close(self):
+        """Score the records already queued, then stop the worker thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'records': self.records,
+            'mean_batch_size': round(self.records / self.batches, 2) if self.batches else 0,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = time.perf_counter() + self.window_s
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+
+            # Skip callers that timed out; the rest can no longer be cancelled
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.records += len(batch)
+            for explain in {explain for _, explain, _ in batch}:
+                self._score([item for item in batch if item[1] == explain], explain)
+
+    def _score(self, items, explain):
+        try:
+            results = self.predict_batch([record for record, _, _ in items], explain)
+        except Exception:
+            # One bad record must not fail its neighbours: retry them one by one
+            for record, _, future in items:
+                try:
+                    future.set_result(self.predict_batch([record], explain)[0])
+                except Exception as e:
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(items, results):
+            future.set_result(result)
+
+
+class _CallClient:
+    """load_test client that calls a predict function in-process instead of posting to a route"""
+
+    def __init__(self, predict_one):
+        self.predict_one = predict_one
+
+    def post(self, path, payload, headers):
+        self.predict_one(payload)
+        return 200
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from integrated_crop_prediction_training import EnhancedCropCyclePredictionModel
+    from load_test import run_load
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'agri_forecasting_model.pkl'
+    dataset = sys.argv[2] if len(sys.argv) > 2 else 'large_agri_dataset.csv'
+    model = EnhancedCropCyclePredictionModel.load_model(model_path)
+    if model is None:
+        raise SystemExit(f"Could not load {model_path}")
+
+    df = pd.read_csv(dataset).sample(n=500, random_state=0)
+    records = [
+        {'crop_type': r.Crop_Type, 'avg_temp': r.Avg_Temp, 'tmax': r.Tmax, 'tmin': r.Tmin, 'sowing_date': r.Sowing_Date}
+        for r in df.itertuples()
+    ]
+
+    def load_test(predict_one, concurrency):
+        """Closed-loop /predict-only load for 3 s; overall stats"""
+        return run_load(_CallClient(predict_one), {'predict': records}, mix='predict',
+                        concurrency=concurrency, duration_s=3.0, warmup=0)['all']
+
+    rows = []
+    for concurrency in (1, 8, 32):
+        direct = load_test(lambda r: model.predict_batch([r])[0], concurrency)
+        rows.append({'concurrency': concurrency, 'mode': 'direct', **direct})
+        for window_ms in (1, 2, 5):
+            with RequestCoalescer(lambda rs, explain: model.predict_batch(rs, explain=explain), window_ms) as coalescer:
+                result = load_test(coalescer.submit, concurrency)
+            rows.append({'concurrency': concurrency, 'mode': f'coalesce {window_ms}ms', **result,
+                         'mean_batch': coalescer.stats()['mean_batch_size']})
+
+    print("\n" + "="*60)
+    print("📊 REQUEST COALESCING LOAD TEST")
+    print("="*60)
+    print(pd.DataFrame(rows).to_string(index=False))
@@ -0,0 +1,101 @@
+# Binary columnar responses for bulk prediction clients
+# Negotiated from the Accept header: Arrow IPC stream (needs pyarrow) or msgpack
+# (needs msgpack). JSON stays the default; both libraries are optional.
+# Streaming endpoints encode column chunks as NDJSON or CSV text instead.
+
+import csv
+import io
+import json
+
+import numpy as np
+from flask import Response
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+MSGPACK = 'application/msgpack'
+MSGPACK_LEGACY = 'application/x-msgpack'
+BINARY_FORMATS = (ARROW_STREAM, MSGPACK, MSGPACK_LEGACY)
+NDJSON = 'application/x-ndjson'
+CSV = 'text/csv'
+STREAMING_FORMATS = (NDJSON, CSV)
+
+
+def available_formats():
+    formats = [JSON]
+    if pa is not None:
+        formats.append(ARROW_STREAM)
+    if msgpack is not None:
+        formats += [MSGPACK, MSGPACK_LEGACY]
+    return formats
+
+
+def negotiate(accept):
+    """Best format for a request's `accept_mimetypes`; None if only unavailable binary formats were asked for"""
+    if not accept:
+        return JSON
+    best = accept.best_match(available_formats())
+    if best is None and not any(mimetype in BINARY_FORMATS for mimetype in accept.values()):
+        return JSON  # e.g. text/html from a browser: keep answering with JSON
+    return best
+
+
+def _arrow_column(values):
+    if isinstance(values, np.ma.MaskedArray):
+        return pa.array(values.data, mask=np.ma.getmaskarray(values))
+    return pa.array(values, from_pandas=True)  # NaT -> null
+
+
+def _list_column(values):
+    if isinstance(values, np.ma.MaskedArray):
+        return [None if m else v for v, m in zip(values.data.tolist(), np.ma.getmaskarray(values).tolist())]
+    if np.issubdtype(values.dtype, np.datetime64):
+        return [None if d == 'NaT' else d for d in np.datetime_as_string(values, unit='D').tolist()]
+    return values.tolist()
+
+
+def columnar_response(columns, mimetype):
+    """Encode a dict of equal-length numpy columns as an Arrow stream or msgpack map"""
+    if mimetype == ARROW_STREAM:
+        table = pa.table({name: _arrow_column(values) for name, values in columns.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), mimetype=ARROW_STREAM)
+
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    payload = {"num_rows": n_rows, "columns": {name: _list_column(values) for name, values in columns.items()}}
+    return Response(msgpack.packb(payload), mimetype=mimetype)
+
+
+def _rows(columns):
+    return zip(*(_list_column(values) for values in columns.values()))
+
+
+def ndjson_chunk(columns):
+    """One JSON object per row of a chunk of columns, newline-terminated"""
+    names = list(columns)
+    return ''.join(json.dumps(dict(zip(names, row))) + '\n' for row in _rows(columns))
+
+
+def csv_chunk(columns, header=False):
+    """CSV text for a chunk of columns (missing values as empty fields)"""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    if header:
+        writer.writerow(columns)
+    writer.writerows(_rows(columns))
+    return out.getvalue()
+
+
+def not_acceptable():
+    return {"error": "Not acceptable", "supported": available_formats()}
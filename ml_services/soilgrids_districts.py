@@ -1,33 +1,146 @@
-# soilgrids_jalgaon.py
-import requests
+# soilgrids_districts.py
+# Bulk SoilGrids 0-30cm fetcher for every GADM district (pooled, concurrent, cached)
+import argparse
+import json
+import os
+import threading
 import time
-import geopandas as gpd
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
 import pandas as pd
+import requests
+import shapely
+from requests.adapters import HTTPAdapter
 from shapely.geometry import Point
-from shapely.geometry import Polygon
-import random
 
 # ====== CONFIG ======
 DIST_SHAPEFILE = "gadm41_IND_shp.zip"  # GADM zip
-OUT_CSV = "soilgrids_jalgaon.csv"
-SOIL_URL = "https://rest.isric.org/soilgrids/v2.0/properties/query"
+DIST_LAYER = "gadm41_IND_2"
+OUT_CSV = "soilgrids_districts.csv"
+SOIL_URL = os.environ.get('SOILGRIDS_URL', "https://rest.isric.org/soilgrids/v2.0/properties/query")
+CACHE_DIR = "soilgrids_cache"
+CACHE_PRECISION = 3  # decimals of lon/lat in the cache key (~100 m)
 PROPERTIES_TO_EXTRACT = ['soc','phh2o','clay','sand','silt','bdod']
 MAX_RETRIES = 5
 TIMEOUT = 120
-BACKOFF = 5
+BACKOFF = 2  # seconds before the first retry, doubling after each
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_WORKERS = 4
+RATE_LIMIT_PER_MIN = 5  # ISRIC fair-use limit; cached points don't count
 SAMPLE_POINTS = 5  # number of random points to try inside polygon
+RANDOM_SEED = 42
 # ====================
 
-def safe_req(url, params, retries=MAX_RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
-    for i in range(retries):
+
+class RateLimiter:
+    """Spaces calls evenly across all worker threads"""
+
+    def __init__(self, calls_per_minute):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ResponseCache:
+    """On-disk JSON cache of SoilGrids responses keyed by rounded lon/lat"""
+
+    def __init__(self, cache_dir=CACHE_DIR, precision=CACHE_PRECISION):
+        self.cache_dir = cache_dir
+        self.precision = precision
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, lon, lat):
+        key = f"{lon:.{self.precision}f}_{lat:.{self.precision}f}"
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, lon, lat):
+        path = self._path(lon, lat)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def put(self, lon, lat, resp_json):
+        path = self._path(lon, lat)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(resp_json, f)
+        os.replace(tmp, path)
+
+
+def make_session(pool_size=MAX_WORKERS):
+    """HTTP session with a connection pool sized for the worker pool.
+
+    Retries are left to fetch_point so that every attempt goes through the rate limiter.
+    """
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _retry_delay(response, attempt, backoff=BACKOFF):
+    """Seconds to wait before retry `attempt` (1-based): Retry-After when given, else exponential backoff"""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+    return backoff * 2 ** (attempt - 1)
+
+
+def fetch_point(session, limiter, cache, url, lon, lat, timeout=TIMEOUT, retries=MAX_RETRIES,
+                backoff=BACKOFF):
+    """Fetch the SoilGrids response for one point, served from cache when possible.
+
+    Returns None when the point fails: request errors or 429/5xx after `retries` retries,
+    other error statuses, or a body that is not JSON. Every attempt waits on the limiter.
+    """
+    lon, lat = round(lon, cache.precision), round(lat, cache.precision)
+    cached = cache.get(lon, lat)
+    if cached is not None:
+        return cached
+
+    for attempt in range(retries + 1):
+        limiter.wait()
+        r = None
         try:
-            r = requests.get(url, params=params, timeout=timeout)
-            if r.status_code == 200:
-                return r.json()
-        except Exception as e:
-            print("Request error:", e)
-        time.sleep(backoff * (i+1))
-    return None
+            r = session.get(url, params={'lon': lon, 'lat': lat}, timeout=timeout)
+        except requests.RequestException as e:
+            print(f"Request error for lon={lon}, lat={lat}:", e)
+        else:
+            if r.status_code not in RETRY_STATUSES:
+                break
+            print(f"Request failed ({r.status_code}) for lon={lon}, lat={lat}")
+        if attempt < retries:
+            time.sleep(_retry_delay(r, attempt + 1, backoff))
+    else:
+        return None
+
+    if r.status_code != 200:
+        print(f"Request failed ({r.status_code}) for lon={lon}, lat={lat}")
+        return None
+    try:
+        resp_json = r.json()
+    except ValueError:
+        resp_json = None
+    if not isinstance(resp_json, dict):
+        print(f"Non-JSON response for lon={lon}, lat={lat}")
+        return None
+    cache.put(lon, lat, resp_json)
+    return resp_json
 
 def extract_weighted_0_30(prop_json):
     if not prop_json:
@@ -72,64 +185,124 @@ def extract_weighted_0_30(prop_json):
         return None
     return sum(v*w for v,w in zip(vals,weights)) / sum(weights)
 
-def get_points_within_polygon(polygon, num_points=SAMPLE_POINTS):
-    """Generate random points inside a polygon"""
-    minx, miny, maxx, maxy = polygon.bounds
-    points = []
-    while len(points) < num_points:
-        pnt = Point(random.uniform(minx, maxx), random.uniform(miny, maxy))
-        if polygon.contains(pnt):
-            points.append(pnt)
-    return points
-
-# ====== LOAD DISTRICT ======
-gdf = gpd.read_file(DIST_SHAPEFILE, layer="gadm41_IND_2")
-gdf = gdf.to_crs(epsg=4326)
-
-# Filter Jalgaon district
-jalgaon_gdf = gdf[(gdf['NAME_2'] == 'Jalgaon') & (gdf['NAME_1'] == 'Maharashtra')]
-if jalgaon_gdf.empty:
-    raise ValueError("Jalgaon district not found!")
-
-row = jalgaon_gdf.iloc[0]
-
-# Try multiple points inside polygon to find valid soil data
-points = get_points_within_polygon(row['geometry'])
-points.insert(0, row['geometry'].centroid)  # add centroid as first point
-
-soil_data = None
-for pt in points:
-    lon, lat = pt.x, pt.y
-    params = {'lon': lon, 'lat': lat}
-    resp_json = safe_req(SOIL_URL, params)
-    if resp_json and 'properties' in resp_json:
-        soil_data = resp_json
-        break  # stop at first successful point
-    time.sleep(0.5)
-
-entry = {
-    'district_name': 'Jalgaon',
-    'lon': lon,
-    'lat': lat
-}
-
-if soil_data and 'properties' in soil_data:
+def extract_soil_entry(soil_data):
+    """Map a SoilGrids response to the *_0_30 columns (None where missing)"""
+    entry = {}
+    properties = (soil_data or {}).get('properties') or {}
     for prop in PROPERTIES_TO_EXTRACT:
         val = None
-        if prop in soil_data['properties']:
-            val = extract_weighted_0_30(soil_data['properties'][prop])
+        if prop in properties:
+            val = extract_weighted_0_30(properties[prop])
         else:
-            for k in soil_data['properties'].keys():
+            for k in properties.keys():
                 if prop.lower() in k.lower():
-                    val = extract_weighted_0_30(soil_data['properties'][k])
+                    val = extract_weighted_0_30(properties[k])
                     break
         entry[prop + '_0_30'] = val
-else:
-    for prop in PROPERTIES_TO_EXTRACT:
-        entry[prop + '_0_30'] = None
+    return entry
+
+def get_points_within_polygon(polygon, num_points=SAMPLE_POINTS, rng=None):
+    """Generate random points inside a polygon (batched rejection sampling)"""
+    rng = rng or np.random.default_rng(RANDOM_SEED)
+    minx, miny, maxx, maxy = polygon.bounds
+    shapely.prepare(polygon)
+    xs, ys = np.empty(0), np.empty(0)
+    while len(xs) < num_points:
+        cand_x = rng.uniform(minx, maxx, 4 * num_points)
+        cand_y = rng.uniform(miny, maxy, 4 * num_points)
+        inside = shapely.contains_xy(polygon, cand_x, cand_y)
+        xs, ys = np.r_[xs, cand_x[inside]], np.r_[ys, cand_y[inside]]
+    return [Point(x, y) for x, y in zip(xs[:num_points], ys[:num_points])]
+
+def load_districts(shapefile=DIST_SHAPEFILE, layer=DIST_LAYER, state=None, district=None,
+                   sample_points=SAMPLE_POINTS):
+    """Read GADM districts and the candidate query points for each of them"""
+    import geopandas as gpd
+
+    gdf = gpd.read_file(shapefile, layer=layer)
+    gdf = gdf.to_crs(epsg=4326)
+    if state:
+        gdf = gdf[gdf['NAME_1'] == state]
+    if district:
+        gdf = gdf[gdf['NAME_2'] == district]
+    if gdf.empty:
+        raise ValueError(f"No districts found for state={state!r}, district={district!r}")
+
+    records = []
+    for row in gdf.itertuples():
+        geom = row.geometry
+        # Centroid first, then a point guaranteed inside, then random interior points
+        points = [geom.centroid, geom.representative_point()]
+        rng = np.random.default_rng([RANDOM_SEED, zlib.crc32(row.GID_2.encode())])
+        points += get_points_within_polygon(geom, sample_points, rng)
+        records.append({
+            'district_id': row.GID_2,
+            'district_name': row.NAME_2,
+            'state_name': row.NAME_1,
+            'points': [(p.x, p.y) for p in points],
+        })
+    return records
+
+def fetch_district(session, limiter, cache, url, record, timeout=TIMEOUT):
+    """Try the district's candidate points in order until one returns soil values"""
+    first = None
+    for lon, lat in record['points']:
+        resp_json = fetch_point(session, limiter, cache, url, lon, lat, timeout)
+        if not resp_json or 'properties' not in resp_json:
+            continue
+        soil = extract_soil_entry(resp_json)
+        if first is None:
+            first = (lon, lat, soil)
+        if any(v is not None for v in soil.values()):
+            first = (lon, lat, soil)
+            break
+
+    lon, lat, soil = first or (*record['points'][0], extract_soil_entry(None))
+    return {
+        'district_id': record['district_id'],
+        'district_name': record['district_name'],
+        'state_name': record['state_name'],
+        'lon': lon,
+        'lat': lat,
+        **soil,
+    }
+
+def fetch_all_districts(records, url=SOIL_URL, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS,
+                        rate_limit_per_min=RATE_LIMIT_PER_MIN, timeout=TIMEOUT):
+    """Fetch soil for every district concurrently; returns a DataFrame in input order"""
+    session = make_session(pool_size=max_workers)
+    limiter = RateLimiter(rate_limit_per_min)
+    cache = ResponseCache(cache_dir)
+
+    results = [None] * len(records)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_district, session, limiter, cache, url, rec, timeout): i
+            for i, rec in enumerate(records)
+        }
+        for done, fut in enumerate(as_completed(futures), 1):
+            i = futures[fut]
+            results[i] = fut.result()
+            print(f"[{done}/{len(records)}] {results[i]['state_name']} / {results[i]['district_name']}")
+    session.close()
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch SoilGrids 0-30cm properties for GADM districts")
+    parser.add_argument('--shapefile', default=DIST_SHAPEFILE)
+    parser.add_argument('--layer', default=DIST_LAYER)
+    parser.add_argument('--state', help="Only districts of this state (NAME_1)")
+    parser.add_argument('--district', help="Only this district (NAME_2), e.g. Jalgaon")
+    parser.add_argument('--out', default=OUT_CSV)
+    parser.add_argument('--url', default=SOIL_URL)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--rate', type=float, default=RATE_LIMIT_PER_MIN, help="Requests per minute (0 = unlimited)")
+    args = parser.parse_args()
 
-# Save CSV
-df = pd.DataFrame([entry])
-df.to_csv(OUT_CSV, index=False)
-print("Saved:", OUT_CSV)
-print(df)
+    records = load_districts(args.shapefile, args.layer, args.state, args.district)
+    df = fetch_all_districts(records, args.url, args.cache_dir, args.workers, args.rate)
+    df.to_csv(args.out, index=False)
+    print("Saved:", args.out)
+    print(df)
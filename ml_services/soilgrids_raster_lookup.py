@@ -0,0 +1,170 @@
+# soilgrids_raster_lookup.py
+# Offline SoilGrids lookups against the bundled 0-30cm GeoTIFFs (no REST calls)
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.errors import RasterioIOError
+from rasterio.warp import transform as warp_transform
+from rasterio.windows import Window
+
+# ====== CONFIG ======
+RASTER_DIR = os.environ.get(
+    'SOILGRIDS_RASTER_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'soilgrids_rasters')
+)
+RASTER_TEMPLATE = "{prop}_0-30cm.tif"
+PROPERTIES_TO_EXTRACT = ['soc','phh2o','clay','sand','silt','bdod']
+BLOCK_CACHE_SIZE = 512  # raster blocks kept in memory across all properties
+# ====================
+
+
+def soil_field_name(prop):
+    """Column name used for a property, matching soilgrids_districts.py output"""
+    return prop + '_0_30'
+
+
+class SoilGridsRasterSampler:
+    """Batched point sampler over local SoilGrids rasters.
+
+    Every raster is opened once. A query maps all points to pixel indices in
+    one vectorized step, groups them by the raster's internal block and reads
+    each touched block a single time (LRU cached), so repeated lookups in the
+    same area never hit the disk again. Values are returned in SoilGrids mapped
+    units, the same ones `extract_weighted_0_30` yields from the REST API.
+
+    Thread-safe: the block cache and the shared dataset handles are only touched
+    under one lock, so concurrent API requests serialise their raster reads.
+    """
+
+    def __init__(self, raster_dir=RASTER_DIR, properties=PROPERTIES_TO_EXTRACT,
+                 block_cache_size=BLOCK_CACHE_SIZE):
+        self.raster_dir = raster_dir
+        self.properties = list(properties)
+        self.block_cache_size = block_cache_size
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        self.datasets = {}
+        for prop in self.properties:
+            path = os.path.join(raster_dir, RASTER_TEMPLATE.format(prop=prop))
+            try:
+                self.datasets[prop] = rasterio.open(path)
+            except RasterioIOError as e:
+                self.close()
+                raise ValueError(f"{path} is not a readable SoilGrids GeoTIFF: {e}")
+
+    def close(self):
+        with self._lock:
+            for ds in self.datasets.values():
+                ds.close()
+            self.datasets = {}
+            self._blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_block(self, prop, ds, block_row, block_col):
+        key = (prop, block_row, block_col)
+        block = self._blocks.get(key)
+        if block is not None:
+            self._blocks.move_to_end(key)
+            return block
+
+        block_h, block_w = ds.block_shapes[0]
+        window = Window(
+            block_col * block_w,
+            block_row * block_h,
+            min(block_w, ds.width - block_col * block_w),
+            min(block_h, ds.height - block_row * block_h),
+        )
+        block = ds.read(1, window=window).astype(np.float64)
+        if ds.nodata is not None:
+            block[block == ds.nodata] = np.nan
+
+        self._blocks[key] = block
+        if len(self._blocks) > self.block_cache_size:
+            self._blocks.popitem(last=False)
+        return block
+
+    def _sample_dataset(self, prop, ds, lons, lats):
+        if ds.crs is not None and not ds.crs.is_geographic:
+            xs, ys = warp_transform('EPSG:4326', ds.crs, lons.tolist(), lats.tolist())
+            xs, ys = np.asarray(xs), np.asarray(ys)
+        else:
+            xs, ys = lons, lats
+
+        cols, rows = ~ds.transform * (xs, ys)
+        rows = np.floor(rows).astype(np.int64)
+        cols = np.floor(cols).astype(np.int64)
+
+        out = np.full(len(lons), np.nan)
+        inside = (rows >= 0) & (rows < ds.height) & (cols >= 0) & (cols < ds.width)
+        if not inside.any():
+            return out
+
+        idx = np.flatnonzero(inside)
+        rows, cols = rows[idx], cols[idx]
+        block_h, block_w = ds.block_shapes[0]
+        block_rows, block_cols = rows // block_h, cols // block_w
+
+        # Visit every touched block exactly once
+        keys = block_rows * ((ds.width + block_w - 1) // block_w) + block_cols
+        order = np.argsort(keys, kind='stable')
+        keys_sorted = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys_sorted[1:] != keys_sorted[:-1]])
+        ends = np.r_[starts[1:], len(keys_sorted)]
+        for start, end in zip(starts, ends):
+            sel = order[start:end]
+            br, bc = block_rows[sel[0]], block_cols[sel[0]]
+            block = self._read_block(prop, ds, br, bc)
+            out[idx[sel]] = block[rows[sel] - br * block_h, cols[sel] - bc * block_w]
+        return out
+
+    def sample(self, lons, lats):
+        """Sample every property at the given points; returns a DataFrame"""
+        lons = np.asarray(lons, dtype=np.float64).ravel()
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        if lons.shape != lats.shape:
+            raise ValueError("lons and lats must have the same length")
+
+        result = {'lon': lons, 'lat': lats}
+        with self._lock:
+            for prop, ds in self.datasets.items():
+                result[soil_field_name(prop)] = self._sample_dataset(prop, ds, lons, lats)
+        return pd.DataFrame(result)
+
+    def sample_point(self, lon, lat):
+        """Sample a single point; missing values are None like the REST extractor"""
+        row = self.sample([lon], [lat]).iloc[0]
+        entry = {'lon': float(lon), 'lat': float(lat)}
+        for prop in self.datasets:
+            val = row[soil_field_name(prop)]
+            entry[soil_field_name(prop)] = None if np.isnan(val) else float(val)
+        return entry
+
+
+if __name__ == "__main__":
+    # Usage: python soilgrids_raster_lookup.py [lon lat]
+    with SoilGridsRasterSampler() as sampler:
+        if len(sys.argv) == 3:
+            print(sampler.sample_point(float(sys.argv[1]), float(sys.argv[2])))
+            sys.exit(0)
+
+        # Throughput check over random points inside India's bounding box
+        rng = np.random.default_rng(42)
+        n = 100_000
+        lons = rng.uniform(68.0, 97.5, n)
+        lats = rng.uniform(6.5, 35.5, n)
+        start = time.perf_counter()
+        df = sampler.sample(lons, lats)
+        elapsed = time.perf_counter() - start
+        print(df.head())
+        print(f"Sampled {n} points in {elapsed:.2f}s ({n / elapsed:,.0f} lookups/s)")
@@ -0,0 +1,149 @@
+# soilgrids_zonal_stats.py
+# District-level soil table from the local SoilGrids rasters (zonal statistics)
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.errors import RasterioIOError
+from rasterio.features import geometry_mask
+from rasterio.windows import Window
+
+from soilgrids_districts import DIST_LAYER, DIST_SHAPEFILE
+from soilgrids_raster_lookup import PROPERTIES_TO_EXTRACT, RASTER_DIR, RASTER_TEMPLATE, soil_field_name
+
+# ====== CONFIG ======
+OUT_CSV = "soilgrids_district_zonal.csv"
+ALL_TOUCHED = False  # only pixels whose centre falls inside the polygon
+# ====================
+
+
+def open_rasters(raster_dir=RASTER_DIR, properties=PROPERTIES_TO_EXTRACT):
+    """Open every property raster and group them by identical pixel grid"""
+    groups = {}
+    for prop in properties:
+        path = os.path.join(raster_dir, RASTER_TEMPLATE.format(prop=prop))
+        try:
+            ds = rasterio.open(path)
+        except RasterioIOError as e:
+            for grid in groups.values():
+                for opened in grid.values():
+                    opened.close()
+            raise ValueError(f"{path} is not a readable SoilGrids GeoTIFF: {e}")
+        grid_key = (ds.crs.to_string() if ds.crs else None, tuple(ds.transform), ds.width, ds.height)
+        groups.setdefault(grid_key, {})[prop] = ds
+    return list(groups.values())
+
+def polygon_window(ds, bounds):
+    """Pixel window covering `bounds`, clipped to the raster; None if disjoint"""
+    minx, miny, maxx, maxy = bounds
+    inv = ~ds.transform
+    cols, rows = zip(*(inv * (x, y) for x, y in ((minx, miny), (minx, maxy), (maxx, miny), (maxx, maxy))))
+    col0, col1 = max(0, math.floor(min(cols))), min(ds.width, math.ceil(max(cols)))
+    row0, row1 = max(0, math.floor(min(rows))), min(ds.height, math.ceil(max(rows)))
+    if col1 <= col0 or row1 <= row0:
+        return None
+    return Window(col0, row0, col1 - col0, row1 - row0)
+
+def pixel_area_weights(ds, window):
+    """Relative pixel areas for a window (cos(lat) scaling on geographic grids)"""
+    if ds.crs is None or not ds.crs.is_geographic:
+        return np.ones((int(window.height), 1))
+    transform = ds.window_transform(window)
+    row_centres = transform.f + transform.e * (np.arange(int(window.height)) + 0.5)
+    return np.cos(np.radians(row_centres))[:, None]
+
+def weighted_median(values, weights):
+    order = np.argsort(values, kind='stable')
+    cum = np.cumsum(weights[order])
+    return float(values[order][np.searchsorted(cum, cum[-1] / 2.0)])
+
+def zonal_stats_for_geometry(datasets, geom):
+    """Area-weighted mean, median and coverage of every raster in one grid group"""
+    ds = next(iter(datasets.values()))
+    window = polygon_window(ds, geom.bounds)
+    stats = {}
+    if window is None:
+        for prop in datasets:
+            field = soil_field_name(prop)
+            stats.update({field: None, field + '_median': None, field + '_coverage': 0.0})
+        return stats
+
+    # One mask and one weight grid per window, shared by all properties on this grid
+    inside = geometry_mask(
+        [geom], out_shape=(int(window.height), int(window.width)),
+        transform=ds.window_transform(window), invert=True, all_touched=ALL_TOUCHED,
+    )
+    area = np.broadcast_to(pixel_area_weights(ds, window), inside.shape)
+    polygon_area = area[inside].sum()
+
+    for prop, prop_ds in datasets.items():
+        field = soil_field_name(prop)
+        data = prop_ds.read(1, window=window, masked=True)
+        valid = inside & ~np.ma.getmaskarray(data)
+        if not valid.any():
+            stats.update({field: None, field + '_median': None, field + '_coverage': 0.0})
+            continue
+        values = np.asarray(data[valid], dtype=np.float64)
+        weights = area[valid]
+        stats[field] = float(np.average(values, weights=weights))
+        stats[field + '_median'] = weighted_median(values, weights)
+        stats[field + '_coverage'] = float(weights.sum() / polygon_area) if polygon_area else 0.0
+    return stats
+
+def district_zonal_table(gdf, raster_dir=RASTER_DIR, properties=PROPERTIES_TO_EXTRACT):
+    """Zonal soil statistics for every district polygon in a GeoDataFrame"""
+    groups = open_rasters(raster_dir, properties)
+    gdf = gdf.sort_values('GID_2').reset_index(drop=True)
+    centroids = gdf.to_crs(epsg=4326).geometry.representative_point()
+    rows = [
+        {
+            'district_id': gdf.at[i, 'GID_2'],
+            'district_name': gdf.at[i, 'NAME_2'],
+            'state_name': gdf.at[i, 'NAME_1'],
+            'lon': centroids.iloc[i].x,
+            'lat': centroids.iloc[i].y,
+        }
+        for i in range(len(gdf))
+    ]
+    try:
+        for datasets in groups:
+            crs = next(iter(datasets.values())).crs
+            geoms = gdf.to_crs(crs).geometry if crs else gdf.geometry
+            for i, geom in enumerate(geoms):
+                rows[i].update(zonal_stats_for_geometry(datasets, geom))
+    finally:
+        for datasets in groups:
+            for ds in datasets.values():
+                ds.close()
+
+    columns = ['district_id', 'district_name', 'state_name', 'lon', 'lat']
+    for prop in properties:
+        field = soil_field_name(prop)
+        columns += [field, field + '_median', field + '_coverage']
+    return pd.DataFrame(rows, columns=columns)
+
+
+if __name__ == "__main__":
+    import geopandas as gpd
+
+    parser = argparse.ArgumentParser(description="District soil table from local SoilGrids rasters")
+    parser.add_argument('--shapefile', default=DIST_SHAPEFILE)
+    parser.add_argument('--layer', default=DIST_LAYER)
+    parser.add_argument('--state', help="Only districts of this state (NAME_1)")
+    parser.add_argument('--raster-dir', default=RASTER_DIR)
+    parser.add_argument('--out', default=OUT_CSV)
+    args = parser.parse_args()
+
+    gdf = gpd.read_file(args.shapefile, layer=args.layer)
+    if args.state:
+        gdf = gdf[gdf['NAME_1'] == args.state]
+
+    start = time.perf_counter()
+    df = district_zonal_table(gdf, args.raster_dir)
+    df.to_csv(args.out, index=False)
+    print(f"Saved: {args.out} ({len(df)} districts in {time.perf_counter() - start:.1f}s)")
+    print(df.head())
@@ -0,0 +1,80 @@
+import importlib
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'large_agri_dataset.csv')
+INITIAL_ROWS = 1500
+RECORD = {'crop_type': 'Rice', 'avg_temp': 28, 'tmax': 33, 'tmin': 23, 'sowing_date': '2025-06-15'}
+
+
+@pytest.fixture(scope='module')
+def served(tmp_path_factory):
+    """The Flask app trained on the first INITIAL_ROWS of the dataset, with no optional resources"""
+    tmp = tmp_path_factory.mktemp('served')
+    dataset = tmp / 'dataset.csv'
+    pd.read_csv(DATASET).iloc[:INITIAL_ROWS].to_csv(dataset, index=False)
+    missing = str(tmp / 'missing')
+    os.environ.update({
+        'AGRI_MODEL_PATH': str(tmp / 'model.pkl'),
+        'AGRI_DATASET_PATH': str(dataset),
+        'AGRI_TRAINING_CACHE_DIR': str(tmp / 'cache'),
+        'AGRI_FORECAST_TABLE_PATH': str(tmp / 'forecast_table.npy'),
+        'AGRI_WEATHER_PATH': missing,
+        'AGRI_DISTRICT_CLIMATE_PATH': missing,
+        'AGRI_DISTRICTS_PATH': missing,
+        'AGRI_DISTRICT_FEATURES_PATH': missing,
+    })
+    app = importlib.import_module('app')
+    app.startup_done.wait()
+    assert app.model is not None
+    return app, dataset
+
+
+def test_incremental_update_swaps_in_a_copy(served):
+    app, dataset = served
+    pd.read_csv(DATASET).iloc[:INITIAL_ROWS + 300].to_csv(dataset, index=False)
+    before = app.model
+    trees = len(before.yield_model.estimators_)
+
+    response = app.app.test_client().post('/train', json={'mode': 'incremental'})
+
+    assert response.status_code == 200, response.get_json()
+    assert app.model is not before
+    assert app.model.training_rows == INITIAL_ROWS + 300
+    # The model /predict was using is left as it was
+    assert before.training_rows == INITIAL_ROWS
+    assert len(before.yield_model.estimators_) == trees
+
+
+def test_predictions_succeed_during_incremental_updates(served):
+    app, dataset = served
+    full = pd.read_csv(DATASET)
+    stop = threading.Event()
+    failures, served_count = [], [0]
+
+    def predict():
+        client = app.app.test_client()
+        while not stop.is_set():
+            response = client.post('/predict', json=RECORD)
+            if response.status_code != 200:
+                failures.append(response.get_json())
+            served_count[0] += 1
+
+    threads = [threading.Thread(target=predict) for _ in range(4)]
+    for t in threads:
+        t.start()
+    try:
+        for rows in (INITIAL_ROWS + 500, INITIAL_ROWS + 700, INITIAL_ROWS + 900):
+            full.iloc[:rows].to_csv(dataset, index=False)
+            response = app.app.test_client().post('/train', json={'mode': 'incremental', 'new_tree_fraction': 0.2})
+            assert response.get_json()['status'] == 'updated'
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    assert served_count[0] > 0
+    assert failures == []
@@ -0,0 +1,39 @@
+import numpy as np
+
+from irrigation_optimizer import STAGE_CODES, _stage_days, plan_fields
+
+
+def _cycle(days_by_code, season=120):
+    return {
+        'season_length_days': season,
+        'growth_stages': {f'stage_{code}': {'bbch_code': code, 'days_from_sowing': days}
+                          for code, days in days_by_code.items()},
+    }
+
+
+def test_stage_days_default_proportions():
+    assert _stage_days(None).tolist() == [7, 24, 42, 60, 78, 86, 102, 120]
+
+
+def test_crop_cycle_overrides_stage_windows():
+    ends = _stage_days(_cycle({0: 30, 8: 200}))
+    assert ends[STAGE_CODES.index(0)] == 30
+    assert ends[STAGE_CODES.index(8)] == 200
+    assert (np.diff(ends) >= 0).all()
+
+
+def test_overrides_ignore_stages_the_crop_skips():
+    # Sugarcane has no Tillering (2): its override must not reopen that window
+    stages = {0: 'Germination', 1: 'Leaf Development', 3: 'Stem Elongation', 8: 'Maturity'}
+    ends = _stage_days(_cycle({2: 50, 3: 90}), stages)
+    tillering = STAGE_CODES.index(2)
+    assert ends[tillering] == ends[tillering - 1]
+    assert ends[STAGE_CODES.index(3)] == 90
+
+
+def test_plan_uses_crop_cycle_dates():
+    field = {'crop_type': 'Rice', 'sowing_date': '2025-06-01', 'water_budget_mm': 300,
+             'crop_cycle': _cycle({0: 30, 8: 200})}
+    stages = {s['bbch_code']: s for s in plan_fields([field])[0]['stages']}
+    assert stages[0]['end_date'] == '2025-07-01'
+    assert stages[8]['end_date'] == '2025-12-18'
@@ -0,0 +1,35 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from quantile_forest import SKETCH_SIZE, QuantileForestSketch
+
+
+def _forest(n_rows=2000, n_trees=5):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n_rows, 4))
+    y = 3 * X[:, 0] + rng.normal(size=n_rows)
+    forest = RandomForestRegressor(n_trees, min_samples_leaf=5, bootstrap=False, random_state=0).fit(X, y)
+    return forest, X, y
+
+
+def test_sketch_matches_targets_reaching_each_node():
+    forest, X, y = _forest()
+    sketch = QuantileForestSketch.fit(forest.estimators_, X, y)
+    assert sketch.n_trees == len(forest.estimators_)
+    assert sketch.sketch.shape == (sum(e.tree_.node_count for e in forest.estimators_), SKETCH_SIZE)
+
+    levels = np.linspace(0, 1, SKETCH_SIZE)
+    for t, est in enumerate(forest.estimators_):
+        rows = sketch.sketch[sketch.tree_offsets[t]:sketch.tree_offsets[t + 1]]
+        # Every row reaches the root; each leaf holds the rows apply() sends there
+        np.testing.assert_allclose(rows[0], np.quantile(y, levels), rtol=1e-5)
+        leaves = est.apply(X.astype(np.float32))
+        leaf = leaves[0]
+        np.testing.assert_allclose(rows[leaf], np.quantile(y[leaves == leaf], levels), rtol=1e-5)
+
+
+def test_quantiles_are_ordered():
+    forest, X, y = _forest()
+    sketch = QuantileForestSketch.fit(forest.estimators_, X, y)
+    lower, median, upper = sketch.quantiles(forest, X[:100].astype(np.float32), [0.05, 0.5, 0.95])
+    assert (lower <= median).all() and (median <= upper).all()
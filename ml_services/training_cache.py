@@ -0,0 +1,104 @@
+# Content-addressed cache for training artifacts
+# Fitted estimators (and other expensive training steps) are stored under a hash
+# of everything that determines them: feature matrix, split, target and
+# hyperparameters. Whole trained models are stored under the model's training key.
+
+import hashlib
+import json
+import os
+import pickle
+
+import pandas as pd
+import sklearn
+
+# ====== CONFIG ======
+CACHE_DIR = os.environ.get('AGRI_TRAINING_CACHE_DIR', 'training_cache')
+MAX_CACHE_MB = 1024  # oldest entries are removed beyond this
+
+
+def frame_hash(obj):
+    """Content hash of a DataFrame/Series (values, column names and dtypes; not the index)"""
+    digest = hashlib.sha256()
+    if isinstance(obj, pd.DataFrame):
+        digest.update(json.dumps([[str(c), str(t)] for c, t in obj.dtypes.items()]).encode())
+    else:
+        digest.update(f"{obj.name}:{obj.dtype}".encode())
+    digest.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def estimator_signature(estimator):
+    """Estimator class, hyperparameters and sklearn version"""
+    params = {k: repr(v) for k, v in sorted(estimator.get_params(deep=False).items())}
+    return json.dumps([type(estimator).__name__, params, sklearn.__version__])
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps([str(p) for p in parts]).encode()).hexdigest()[:32]
+
+
+class TrainingCache:
+    """Pickle-per-entry cache on disk, safe to share between runs and processes.
+
+    Directories are created on the first write, so constructing one has no side effects.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_mb=MAX_CACHE_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get_or_compute(self, key, compute):
+        """Cached value for `key`, or compute, store and return it"""
+        path = self._path(key)
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+                os.utime(path)  # keep recently used entries on prune
+                self.hits += 1
+                return value
+            except Exception:
+                pass  # unreadable entry: recompute and overwrite
+        self.misses += 1
+        value = compute()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(tmp, path)
+        self.prune()
+        return value
+
+    def model_path(self, training_key, create=False):
+        """Pickle path of a whole trained model; `create` makes its directory for a write"""
+        models_dir = os.path.join(self.cache_dir, 'models')
+        if create:
+            os.makedirs(models_dir, exist_ok=True)
+        return os.path.join(models_dir, f"{training_key}.pkl")
+
+    def has_model(self, training_key):
+        return bool(training_key) and os.path.exists(self.model_path(training_key))
+
+    def prune(self):
+        """Remove least recently used entries until the cache fits in max_mb"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.pkl'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,117 @@
+# Bulk scoring of uploaded CSV files
+# The CSV is parsed in fixed-size chunks, each chunk is scored with one
+# predict_columns call and encoded straight away, so memory is bounded by the
+# chunk size rather than the file size. Bad rows are reported inline, not fatal.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from response_formats import CSV, csv_chunk, ndjson_chunk
+
+# ====== CONFIG ======
+CHUNK_ROWS = int(os.environ.get('AGRI_UPLOAD_CHUNK_ROWS', '2000'))
+REQUIRED_COLUMNS = ['crop_type', 'avg_temp', 'tmax', 'tmin']
+COLUMN_ALIASES = {'crop': 'crop_type', 'temp': 'avg_temp', 'avg_temp_c': 'avg_temp', 'date': 'sowing_date'}
+DEFAULT_ID_COLUMNS = ['field_id']
+
+
+def _normalise_columns(chunk):
+    names = [str(c).strip().lower() for c in chunk.columns]
+    return chunk.set_axis([COLUMN_ALIASES.get(n, n) for n in names], axis=1)
+
+
+def read_chunks(stream, chunk_rows=CHUNK_ROWS):
+    """Iterator of DataFrame chunks with normalised column names; fails early on a bad header"""
+    reader = pd.read_csv(stream, chunksize=chunk_rows, dtype=str, keep_default_na=False, skipinitialspace=True)
+    first = next(reader, None)
+    if first is None:
+        raise ValueError("Empty CSV")
+    first = _normalise_columns(first)
+    missing = [c for c in REQUIRED_COLUMNS if c not in first.columns]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+
+    def chunks():
+        yield first
+        for chunk in reader:
+            yield _normalise_columns(chunk)
+    return chunks()
+
+
+def _validate(chunk):
+    """Model records for the valid rows, plus a per-row error message (None when valid)"""
+    n = len(chunk)
+    errors = np.full(n, None, dtype=object)
+    crops = chunk['crop_type'].str.strip()
+    errors[(crops == '').to_numpy()] = "missing crop_type"
+
+    temps = {}
+    for name in ('avg_temp', 'tmax', 'tmin'):
+        temps[name] = pd.to_numeric(chunk[name], errors='coerce')
+        bad = temps[name].isna().to_numpy() & pd.isna(errors)
+        errors[bad] = f"invalid {name}"
+
+    if 'sowing_date' in chunk:
+        raw = chunk['sowing_date'].str.strip()
+        parsed = pd.to_datetime(raw, format='%Y-%m-%d', errors='coerce')
+        bad = (parsed.isna() & (raw != '')).to_numpy() & pd.isna(errors)
+        errors[bad] = "invalid sowing_date (expected YYYY-MM-DD)"
+        sowing = np.where(parsed.isna(), None, parsed.dt.strftime('%Y-%m-%d'))
+    else:
+        sowing = np.full(n, None, dtype=object)
+
+    valid = pd.isna(errors)
+    frame = pd.DataFrame({'crop_type': crops, **temps, 'sowing_date': sowing})[valid]
+    return frame.to_dict('records'), errors, valid
+
+
+def _expand(values, valid):
+    """Column for the whole chunk from a column over its valid rows (masked / NaT elsewhere)"""
+    if valid.all():
+        return values
+    if np.issubdtype(values.dtype, np.datetime64):
+        full = np.full(len(valid), np.datetime64('NaT'), dtype=values.dtype)
+        full[valid] = values
+        return full
+    data = np.zeros(len(valid), dtype=values.dtype)
+    data[valid] = np.ma.getdata(values)
+    mask = np.ones(len(valid), dtype=bool)
+    mask[valid] = np.ma.getmaskarray(values)
+    return np.ma.masked_array(data, mask=mask)
+
+
+def score_chunk(model, chunk, first_row, id_columns=(), explain=False, template=None, monitor=None):
+    """Columns for one chunk: row number, id columns, predictions and error.
+
+    `template` (prediction columns of any one record) fills in the prediction
+    columns of a chunk without valid rows; valid rows are counted by the drift `monitor`.
+    """
+    records, errors, valid = _validate(chunk)
+    if monitor is not None and records:
+        monitor.record_many([r['crop_type'] for r in records],
+                            [[r['avg_temp'], r['tmax'], r['tmin']] for r in records])
+    columns = {'row': np.arange(first_row, first_row + len(chunk))}
+    for name in id_columns:
+        columns[name] = chunk[name].to_numpy(dtype=object)
+    if records:
+        predictions = model.predict_columns(records, explain=explain)
+    else:
+        predictions = {name: values[:0] for name, values in (template or {}).items()}
+    for name, values in predictions.items():
+        columns[name] = _expand(values, valid)
+    columns['crop_type'] = chunk['crop_type'].to_numpy(dtype=object)  # as uploaded, also for bad rows
+    columns['error'] = errors
+    return columns
+
+
+def stream_scores(model, chunks, mimetype, id_columns=None, explain=False, monitor=None):
+    """Generator of encoded NDJSON / CSV text, one piece per chunk"""
+    template = model.predict_columns([{'crop_type': '', 'avg_temp': 0, 'tmax': 0, 'tmin': 0}], explain=explain)
+    first_row = 0
+    for i, chunk in enumerate(chunks):
+        ids = [c for c in (DEFAULT_ID_COLUMNS if id_columns is None else id_columns) if c in chunk.columns]
+        columns = score_chunk(model, chunk, first_row, ids, explain, template, monitor)
+        first_row += len(chunk)
+        yield csv_chunk(columns, header=i == 0) if mimetype == CSV else ndjson_chunk(columns)
@@ -0,0 +1,239 @@
+# Append-only daily weather store
+# Daily records are appended to a fixed-width binary file (read back memory-mapped),
+# while cumulative rainfall and yearly/seasonal aggregates are carried forward in a
+# small JSON state, so adding new days never re-reads or re-aggregates the history.
+# Usage:
+#   python weather_store.py import Processed_AgriWeather.csv
+#   python weather_store.py append new_days.csv
+#   python weather_store.py summary
+
+import argparse
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from climatology import MISSING_VALUE, WEATHER_CSV
+
+# ====== CONFIG ======
+STORE_DIR = os.environ.get('AGRI_WEATHER_STORE_DIR', 'weather_store')
+GDD_BASE_C = 10.0
+MEASUREMENTS = ['Temp_Max_C', 'Temp_Min_C', 'Temp_Mean_C', 'Rainfall_mm', 'SolarRad_MJ_m2',
+                'Rel_Humidity_pct', 'WindSpeed_mps', 'GDD']
+SUMMED = {'Rainfall_mm', 'GDD'}  # aggregated as totals; everything else as means
+# Cropping seasons by month; Rabi runs Nov-Mar and is labelled with the year it starts
+SEASONS = {6: 'Kharif', 7: 'Kharif', 8: 'Kharif', 9: 'Kharif', 10: 'Kharif',
+           11: 'Rabi', 12: 'Rabi', 1: 'Rabi', 2: 'Rabi', 3: 'Rabi', 4: 'Zaid', 5: 'Zaid'}
+SEASON_ORDER = {'Zaid': 0, 'Kharif': 1, 'Rabi': 2}  # within a season year
+
+RECORD = np.dtype([('DATE', 'M8[D]')] + [(c, '<f8') for c in MEASUREMENTS + ['Cumulative_Rainfall_mm']])
+
+
+def _season_keys(dates):
+    months = dates.month.to_numpy()
+    years = dates.year.to_numpy() - (months <= 3)  # Jan-Mar belong to the previous year's Rabi
+    return [f"{y} {SEASONS[m]}" for y, m in zip(years, months)]
+
+
+def _empty_state():
+    return {'rows': 0, 'last_date': None, 'cumulative_rainfall_mm': 0.0, 'yearly': {}, 'seasonal': {}}
+
+
+@contextmanager
+def _exclusive(lock_path):
+    """Hold an OS file lock (released by the OS if the process dies)"""
+    with open(lock_path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _accumulate(periods, keys, values):
+    """Add per-period day counts, sums and valid-value counts of `values` into `periods`"""
+    grouped = values.groupby(keys)
+    sums, valid, days = grouped.sum(), grouped.count(), grouped.size()
+    for key in days.index:
+        period = periods.setdefault(str(key), {'days': 0, 'sum': dict.fromkeys(MEASUREMENTS, 0.0),
+                                               'valid': dict.fromkeys(MEASUREMENTS, 0)})
+        period['days'] += int(days[key])
+        for column in MEASUREMENTS:
+            period['sum'][column] += float(sums.at[key, column])
+            period['valid'][column] += int(valid.at[key, column])
+
+
+def _summary(periods, index_name):
+    rows = {}
+    for key, period in periods.items():
+        rows[key] = {'Days': period['days']}
+        for column in MEASUREMENTS:
+            total, n = period['sum'][column], period['valid'][column]
+            rows[key][column] = (total if column in SUMMED else total / n) if n else np.nan
+    frame = pd.DataFrame.from_dict(rows, orient='index')
+    frame.index.name = index_name
+    return frame
+
+
+class WeatherStore:
+    """Daily weather history in `<path>/daily.bin` plus incremental aggregates in `<path>/state.json`.
+
+    Appends go to the end of the binary file first and only become visible once
+    the state (row count, running totals) is swapped in, so readers never see a
+    partial append. Opening a store only reads the state; writers serialise on
+    `<path>/append.lock` and drop rows left by an interrupted append before writing.
+    """
+
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        self.data_path = os.path.join(path, 'daily.bin')
+        self.state_path = os.path.join(path, 'state.json')
+        self.lock_path = os.path.join(path, 'append.lock')
+        self.state = self._read_state()
+
+    def _read_state(self):
+        if not os.path.exists(self.state_path):
+            return _empty_state()
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def __len__(self):
+        return self.state['rows']
+
+    @property
+    def last_date(self):
+        return pd.Timestamp(self.state['last_date']) if self.state['last_date'] else None
+
+    def append(self, records):
+        """Append daily records (DataFrame or list of dicts with DATE and measurement columns).
+
+        Dates must be later than the last stored day. Fill values become NaN and
+        count as no rain; GDD is derived from Tmax/Tmin when not given.
+        Returns the number of days appended.
+        """
+        frame = pd.DataFrame(records).copy()
+        if frame.empty:
+            return 0
+        frame['DATE'] = pd.to_datetime(frame['DATE'])
+        frame = frame.sort_values('DATE')
+        if frame['DATE'].duplicated().any():
+            raise ValueError("Duplicate dates in appended records")
+
+        os.makedirs(self.path, exist_ok=True)
+        with _exclusive(self.lock_path):
+            # Another writer may have appended since this store was opened
+            self.state = self._read_state()
+            committed = self.state['rows'] * RECORD.itemsize
+            if os.path.exists(self.data_path) and os.path.getsize(self.data_path) > committed:
+                os.truncate(self.data_path, committed)  # rows of an interrupted append
+            return self._append(frame)
+
+    def _append(self, frame):
+        if self.last_date is not None and frame['DATE'].iloc[0] <= self.last_date:
+            raise ValueError(f"Records must start after the last stored day ({self.last_date.date()})")
+
+        values = frame.reindex(columns=MEASUREMENTS).astype(float).replace(MISSING_VALUE, np.nan)
+        derived_gdd = ((values['Temp_Max_C'] + values['Temp_Min_C']) / 2 - GDD_BASE_C).clip(lower=0)
+        values['GDD'] = values['GDD'].fillna(derived_gdd)
+
+        cumulative = self.state['cumulative_rainfall_mm'] + values['Rainfall_mm'].fillna(0).cumsum()
+        block = np.empty(len(frame), dtype=RECORD)
+        block['DATE'] = frame['DATE'].to_numpy().astype('M8[D]')
+        for column in MEASUREMENTS:
+            block[column] = values[column].to_numpy()
+        block['Cumulative_Rainfall_mm'] = cumulative.to_numpy()
+
+        with open(self.data_path, 'ab') as f:
+            f.write(block.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        dates = pd.DatetimeIndex(frame['DATE'])
+        state = json.loads(json.dumps(self.state))  # updated copy; swapped in after the data is on disk
+        _accumulate(state['yearly'], dates.year.to_numpy(), values.set_index(dates))
+        _accumulate(state['seasonal'], _season_keys(dates), values.set_index(dates))
+        state['rows'] += len(frame)
+        state['last_date'] = str(dates[-1].date())
+        state['cumulative_rainfall_mm'] = float(cumulative.iloc[-1])
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+        self.state = state
+        return len(frame)
+
+    def daily(self):
+        """Read-only memory-mapped structured array of the committed daily records"""
+        if not self.state['rows']:
+            return np.empty(0, dtype=RECORD)
+        # Only the committed rows: an append in progress may have written more
+        return np.memmap(self.data_path, dtype=RECORD, mode='r', shape=(self.state['rows'],))
+
+    def frame(self, start=None, end=None):
+        """Daily weather indexed by DATE (the load_weather layout), optionally sliced by date"""
+        daily = self.daily()
+        if start is not None or end is not None:
+            dates = daily['DATE']
+            lo = np.searchsorted(dates, np.datetime64(start, 'D')) if start is not None else 0
+            hi = np.searchsorted(dates, np.datetime64(end, 'D'), side='right') if end is not None else len(daily)
+            daily = daily[lo:hi]
+        frame = pd.DataFrame({name: np.asarray(daily[name]) for name in RECORD.names})
+        frame['DATE'] = frame['DATE'].astype('datetime64[ns]')
+        return frame.set_index('DATE')
+
+    def yearly(self):
+        """Per-year totals (rainfall, GDD) and means (everything else), as in prepare_agri_ml_data.py"""
+        return _summary(self.state['yearly'], 'Year').rename(index=int).sort_index()
+
+    def seasonal(self):
+        """Per-season totals and means, keyed like '2024 Kharif'"""
+        frame = _summary(self.state['seasonal'], 'Season')
+        return frame.sort_index(key=lambda keys: [(int(k.split()[0]), SEASON_ORDER[k.split()[1]]) for k in keys])
+
+    @classmethod
+    def import_csv(cls, csv_path=WEATHER_CSV, path=STORE_DIR):
+        """Build a store from a daily weather CSV (e.g. Processed_AgriWeather.csv).
+
+        Trailing days that are entirely fill values (not yet published upstream)
+        are skipped so they can be appended once real values arrive.
+        """
+        frame = pd.read_csv(csv_path)
+        store = cls(path)
+        if len(store):
+            frame = frame[pd.to_datetime(frame['DATE']) > store.last_date]
+        published = (frame[MEASUREMENTS[:-1]] != MISSING_VALUE).any(axis=1).to_numpy()
+        last = published.nonzero()[0][-1] + 1 if published.any() else 0
+        store.append(frame.iloc[:last])
+        return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append-only daily weather store")
+    parser.add_argument('command', choices=['import', 'append', 'summary'])
+    parser.add_argument('csv', nargs='?', default=WEATHER_CSV, help="Daily weather CSV for import/append")
+    parser.add_argument('--store', default=STORE_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        store = WeatherStore.import_csv(args.csv, args.store)
+    else:
+        store = WeatherStore(args.store)
+        if args.command == 'append':
+            added = store.append(pd.read_csv(args.csv))
+            print(f"➕ Appended {added} days")
+
+    print(f"🌦️  {len(store)} days up to {store.last_date.date() if store.last_date else '-'}, "
+          f"cumulative rainfall {store.state['cumulative_rainfall_mm']:.1f} mm")
+    print(store.yearly().round(2).to_string())